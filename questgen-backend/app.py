@@ -1,19 +1,67 @@
 import os
-from flask import Flask, request, jsonify, send_file
+import gzip
+import shutil
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from flask import Flask, request, jsonify, send_file, g, has_request_context, Response, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
 import enum
 import pdfplumber
 
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
+# Paging cursors travel in response headers, which cross-origin clients can only read when exposed
+CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}}, expose_headers=["X-Next-After-Id", "X-Next-Offset"])
 
 DB_URL = os.getenv("DATABASE_URL", "sqlite:///app.db")
 app.config["SQLALCHEMY_DATABASE_URI"] = DB_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(__file__), "uploads")
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+# Question bank ingestion: worker processes for PDF extraction/parsing and concurrent jobs
+app.config["INGEST_MAX_WORKERS"] = int(os.getenv("INGEST_MAX_WORKERS", "2"))
+app.config["INGEST_MAX_JOBS"] = int(os.getenv("INGEST_MAX_JOBS", "2"))
+# Number of page ranges a single PDF is split into for parallel text extraction
+app.config["PDF_EXTRACT_WORKERS"] = int(os.getenv("PDF_EXTRACT_WORKERS", str(app.config["INGEST_MAX_WORKERS"])))
+# Pages per extraction task (bounds memory) and questions per insert flush
+app.config["PDF_EXTRACT_CHUNK_PAGES"] = int(os.getenv("PDF_EXTRACT_CHUNK_PAGES", "8"))
+# Text extraction backend: "pdfplumber" (default) or "pdfium" (faster, falls back to pdfplumber per empty page)
+app.config["PDF_EXTRACT_BACKEND"] = os.getenv("PDF_EXTRACT_BACKEND", "pdfplumber")
+app.config["INGEST_BATCH_SIZE"] = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+# On-disk cache of extracted text / parse results keyed by the upload's SHA-256, evicted LRU by size
+app.config["INGEST_CACHE_DIR"] = os.getenv("INGEST_CACHE_DIR", os.path.join(os.path.dirname(__file__), "ingest_cache"))
+app.config["INGEST_CACHE_MAX_BYTES"] = int(os.getenv("INGEST_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Paper generation engine: "solver" (flow-based blueprint allocation) or "greedy"
+app.config["PAPER_ENGINE"] = os.getenv("PAPER_ENGINE", "solver")
+# How far back generation avoids reusing questions: the last N drafts, or the last N days when set
+app.config["USAGE_LOOKBACK_DRAFTS"] = int(os.getenv("USAGE_LOOKBACK_DRAFTS", "5"))
+app.config["USAGE_LOOKBACK_DAYS"] = int(os.getenv("USAGE_LOOKBACK_DAYS", "0"))
+# Seeded generation results kept per process, keyed by (pool version, selection config, seed)
+app.config["GENERATION_CACHE_MAX_ENTRIES"] = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "256"))
+# Subjects whose generation pool is kept in memory (per process)
+app.config["POOL_CACHE_MAX_SUBJECTS"] = int(os.getenv("POOL_CACHE_MAX_SUBJECTS", "64"))
+# Profile every paper generation (otherwise only requests with "profile": true), and how many
+# recent profiles GET /api/generation-stats aggregates
+app.config["GENERATION_PROFILING"] = os.getenv("GENERATION_PROFILING", "0") == "1"
+app.config["GENERATION_STATS_WINDOW"] = int(os.getenv("GENERATION_STATS_WINDOW", "500"))
+# GET /api/questions: largest page a client may ask for, and rows fetched per round trip when streaming
+app.config["QUESTIONS_PAGE_MAX_LIMIT"] = int(os.getenv("QUESTIONS_PAGE_MAX_LIMIT", "1000"))
+app.config["QUESTIONS_STREAM_BATCH"] = int(os.getenv("QUESTIONS_STREAM_BATCH", "500"))
+
+# Apply pending schema migrations whenever app is imported. Off by default so WSGI workers,
+# benchmarks and extraction worker processes do not each migrate; deployments run
+# migrate_db.py and the development server (python app.py) migrates before it starts.
+app.config["AUTO_MIGRATE"] = os.getenv("AUTO_MIGRATE", "0") == "1"
 
 # DB
 db = SQLAlchemy(app)
@@ -61,6 +109,9 @@ class StudentTask(db.Model):
     status = db.Column(db.Enum(TaskStatus), default=TaskStatus.PENDING, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_student_tasks_student_due', 'student_id', 'due_date'),
+    )
 
 
 class Scheme(db.Model):
@@ -100,9 +151,25 @@ class Question(db.Model):
     module = db.Column(db.Integer, nullable=True)  # Module number (1-5)
     status = db.Column(db.Enum(QuestionStatus), default=QuestionStatus.DRAFT, nullable=False)
     parse_confidence = db.Column(db.Float)
-    source_file = db.Column(db.String(512))
+    source_file = db.Column(db.String(512), index=True)
+    text_fingerprint = db.Column(db.String(40), index=True)  # question_fingerprint(text), for dedup
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        # Listing filters and the generation pool query (scheme + subject, then the optional filters)
+        db.Index('ix_questions_scope', 'scheme_id', 'subject_id', 'module', 'status', 'rbt_level'),
+        # Keyset pages and the NDJSON stream of a subject, read in id order without a sort
+        db.Index('ix_questions_scope_id', 'scheme_id', 'subject_id', 'id'),
+    )
+
+class QuestionCoTag(db.Model):
+    """One row per CO tag of a question (mirrors Question.co_tags) so CO filters use an index."""
+    __tablename__ = 'question_co_tags'
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    co = db.Column(db.String(16), primary_key=True)
+    __table_args__ = (
+        db.Index('ix_question_co_tags_co_question', 'co', 'question_id'),
+    )
 
 class QuestionBank(db.Model):
     __tablename__ = 'question_banks'
@@ -114,6 +181,9 @@ class QuestionBank(db.Model):
     file_path = db.Column(db.String(512), nullable=False)
     question_count = db.Column(db.Integer, default=0)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_question_banks_subject_module', 'scheme_id', 'subject_id', 'module'),
+    )
 
 class SubjectSyllabus(db.Model):
     __tablename__ = 'subject_syllabus'
@@ -123,6 +193,9 @@ class SubjectSyllabus(db.Model):
     file_name = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(512), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_subject_syllabus_subject', 'scheme_id', 'subject_id'),
+    )
 
 class ModuleNote(db.Model):
     __tablename__ = 'module_notes'
@@ -133,6 +206,9 @@ class ModuleNote(db.Model):
     file_name = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(512), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_module_notes_subject_module', 'scheme_id', 'subject_id', 'module'),
+    )
 
 class PaperDraft(db.Model):
     __tablename__ = 'paper_drafts'
@@ -145,6 +221,56 @@ class PaperDraft(db.Model):
     co_table = db.Column(db.JSON)
     rbt_table = db.Column(db.JSON)
     rows = db.Column(db.JSON)
+    # generation_key() of the seeded request that produced the draft
+    generation_key = db.Column(db.String(40), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class QuestionUsage(db.Model):
+    """One row per question part placed in a draft; rewritten whenever the draft is saved."""
+    __tablename__ = 'question_usage'
+    id = db.Column(db.Integer, primary_key=True)
+    scheme_id = db.Column(db.Integer, nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    question_id = db.Column(db.Integer)  # None for parts typed in by hand
+    text_fingerprint = db.Column(db.String(40))
+    draft_id = db.Column(db.Integer, db.ForeignKey('paper_drafts.id'), nullable=False, index=True)
+    used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        db.Index('ix_question_usage_subject_question_used', 'subject_id', 'question_id', 'used_at'),
+        db.Index('ix_question_usage_subject_used', 'subject_id', 'used_at'),
+    )
+
+class QuestionPoolVersion(db.Model):
+    """Bumped in the same transaction as any write to a subject's questions."""
+    __tablename__ = 'question_pool_versions'
+    scheme_id = db.Column(db.Integer, primary_key=True)
+    subject_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# -------- Ingestion jobs --------
+class IngestJobStatus(enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+class IngestJob(db.Model):
+    __tablename__ = 'ingest_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    scheme_id = db.Column(db.Integer, db.ForeignKey('schemes.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
+    module = db.Column(db.Integer, nullable=False)  # 1-5
+    file_name = db.Column(db.String(255), nullable=False)  # original upload name
+    file_path = db.Column(db.String(512), nullable=False)
+    status = db.Column(db.Enum(IngestJobStatus), default=IngestJobStatus.QUEUED, nullable=False)
+    pages_total = db.Column(db.Integer, default=0)
+    pages_done = db.Column(db.Integer, default=0)
+    questions_parsed = db.Column(db.Integer, default=0)
+    bank_id = db.Column(db.Integer, db.ForeignKey('question_banks.id'))  # set once the bank is committed
+    batch_id = db.Column(db.String(32), index=True)  # groups files uploaded together
+    warnings = db.Column(db.JSON)
+    errors = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -169,122 +295,992 @@ class ScheduleEvent(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # required when audience == STUDENT
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        # Student calendars filter on audience (+ semester) and order by start time
+        db.Index('ix_schedule_events_audience_semester_start', 'audience', 'semester', 'start_time'),
+        db.Index('ix_schedule_events_teacher_start', 'teacher_id', 'start_time'),
+    )
 
-with app.app_context():
-    db.create_all()
-    # Ensure new columns exist for StudentTask when using SQLite (basic migration)
+# -------- Schema migrations --------
+class SchemaMigration(db.Model):
+    """Applied entries of MIGRATIONS; the schema version is the highest one."""
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+def _add_missing_columns(conn, table, columns):
+    existing = {col['name'] for col in db.inspect(conn).get_columns(table)}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+def _create_model_indexes(conn, names):
+    """Create indexes declared on the models (by name) unless they already exist."""
+    indexes = {idx.name: idx for table in db.metadata.tables.values() for idx in table.indexes}
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+def _migration_legacy_columns(conn):
+    # Columns that migrate_db.py, the old migrations/ scripts and start-up checks used to add
+    _add_missing_columns(conn, 'questions', [('module', 'INTEGER'), ('text_fingerprint', 'VARCHAR(40)')])
+    _add_missing_columns(conn, 'student_tasks', [('start_time', 'DATETIME'), ('end_time', 'DATETIME')])
+    _add_missing_columns(conn, 'ingest_jobs', [('batch_id', 'VARCHAR(32)')])
+    _create_model_indexes(conn, ['ix_questions_text_fingerprint', 'ix_ingest_jobs_batch_id'])
+
+def _migration_list_indexes(conn):
+    _create_model_indexes(conn, [
+        'ix_questions_scope', 'ix_questions_source_file',
+        'ix_schedule_events_audience_semester_start', 'ix_schedule_events_teacher_start',
+        'ix_student_tasks_student_due', 'ix_question_banks_subject_module',
+        'ix_subject_syllabus_subject', 'ix_module_notes_subject_module',
+    ])
+
+def _migration_draft_generation_key(conn):
+    _add_missing_columns(conn, 'paper_drafts', [('generation_key', 'VARCHAR(40)')])
+    _create_model_indexes(conn, ['ix_paper_drafts_generation_key'])
+
+def _migration_question_keyset_index(conn):
+    _create_model_indexes(conn, ['ix_questions_scope_id'])
+
+def _fts_subpart_text(row):
+    # Subpart texts of a questions row as one string ({"text": ...} objects or plain strings)
+    return (
+        "(SELECT group_concat(CASE type WHEN 'object' THEN json_extract(value, '$.text') "
+        "WHEN 'text' THEN value END, ' ') "
+        f"FROM json_each(CASE WHEN json_valid({row}.subparts) THEN {row}.subparts END))"
+    )
+
+def _migration_question_fts(conn):
+    # FTS5 is SQLite only; elsewhere (or without the fts5 module) search reports itself unavailable
+    from sqlalchemy.exc import OperationalError
+    if conn.dialect.name != 'sqlite':
+        return
     try:
-        if DB_URL.startswith('sqlite'):
-            from sqlalchemy import text
-            info = db.session.execute(text("PRAGMA table_info(student_tasks)")).fetchall()
-            cols = {row[1] for row in info}
-            if 'start_time' not in cols:
-                db.session.execute(text("ALTER TABLE student_tasks ADD COLUMN start_time DATETIME"))
-            if 'end_time' not in cols:
-                db.session.execute(text("ALTER TABLE student_tasks ADD COLUMN end_time DATETIME"))
-            db.session.commit()
-    except Exception:
-        db.session.rollback()
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(text, subparts)")
+    except OperationalError:
+        return
+    # Triggers keep the index in step with every write path (ORM, bulk inserts, bank deletes)
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+            INSERT INTO questions_fts(rowid, text, subparts) VALUES (NEW.id, NEW.text, {_fts_subpart_text('NEW')});
+        END""")
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+            DELETE FROM questions_fts WHERE rowid = OLD.id;
+        END""")
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE OF text, subparts ON questions BEGIN
+            DELETE FROM questions_fts WHERE rowid = OLD.id;
+            INSERT INTO questions_fts(rowid, text, subparts) VALUES (NEW.id, NEW.text, {_fts_subpart_text('NEW')});
+        END""")
+    conn.exec_driver_sql("DELETE FROM questions_fts")
+    conn.exec_driver_sql(
+        f"INSERT INTO questions_fts(rowid, text, subparts) SELECT id, text, {_fts_subpart_text('questions')} FROM questions")
+
+def _migration_question_co_tags(conn):
+    backfill_question_co_tags(conn)
+
+def _migration_question_fingerprints(conn):
+    backfill_question_fingerprints(conn)
+
+def _migration_question_usage(conn):
+    backfill_question_usage(conn)
+
+# Append only: (version, name, upgrade(connection)). Upgrades must also be safe on databases
+# that db.create_all() has just built from the current models.
+MIGRATIONS = [
+    (1, 'legacy columns', _migration_legacy_columns),
+    (2, 'indexes for list endpoints and generation', _migration_list_indexes),
+    (3, 'full-text index over question and subpart text', _migration_question_fts),
+    (4, 'generation key on paper drafts', _migration_draft_generation_key),
+    (5, 'CO tags of existing questions', _migration_question_co_tags),
+    (6, 'text fingerprints of existing questions', _migration_question_fingerprints),
+    (7, 'usage ledger of existing drafts', _migration_question_usage),
+    (8, 'id-ordered index for question pages', _migration_question_keyset_index),
+]
+
+def schema_version():
+    """Highest applied migration; 0 for a database no migration has touched yet (read-only)."""
+    with db.engine.connect() as conn:
+        if not db.inspect(conn).has_table(SchemaMigration.__tablename__):
+            return 0
+        return conn.execute(db.select(db.func.max(SchemaMigration.version))).scalar() or 0
+
+def run_migrations(target=None):
+    """Create missing tables, then apply pending MIGRATIONS up to `target` in order.
+
+    Each migration runs in its own transaction together with its schema_migrations row.
+    Safe to run from several processes at once: on SQLite each transaction takes the write
+    lock first and re-checks the version, elsewhere the process that loses the insert of
+    the schema_migrations row leaves the migration to the winner. Returns the versions applied.
+    """
+    from sqlalchemy.exc import IntegrityError
+    def locked(conn):
+        if conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    with db.engine.begin() as conn:
+        locked(conn)
+        db.metadata.create_all(conn)
+    with db.engine.connect() as conn:
+        done = set(conn.execute(db.select(SchemaMigration.version)).scalars())
+    applied = []
+    for version, name, upgrade in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        try:
+            with db.engine.begin() as conn:
+                locked(conn)
+                recorded = db.select(SchemaMigration.version).where(SchemaMigration.version == version)
+                if conn.execute(recorded).first() is not None:
+                    continue
+                upgrade(conn)
+                conn.execute(db.insert(SchemaMigration.__table__).values(version=version, name=name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            continue
+        applied.append(version)
+    return applied
 
 # Helpers
 import re
 
+# Bump whenever parse_bank_text output changes so cached parse results are not reused
+PARSER_VERSION = 1
+
+# Precompiled tokens for parse_bank_text / clean_question_text
+_Q_HEADER = re.compile(r"(?i)\s*Q\s*\d+\.")
+_Q_PREFIX = re.compile(r"(?i)^Q\s*\d+\.?\s*")
+# Module [Module X]/[M X], marks [10]/[10M], CO [CO4] and RBT [L2] tags. Every alternative is a
+# bracket group without inner brackets, so one scan finds exactly what separate searches would.
+_TAG_TOKEN = re.compile(
+    r"(?P<module>(?i:\[\s*(?:Module|M)\s*(?P<module_no>\d+)\]))"
+    r"|\[(?P<marks>\d+)(?:\s*[mM])?\]"
+    r"|\[CO(?P<co>\d+)\]"
+    r"|\[L(?P<rbt>[1-6])\]"
+)
+# Line-start subpart labels: lettered a) (b) or roman i) (iv)
+_LINE_SUBPART = re.compile(r"(?i)\s*\(?(?:(?P<letter>[a-d])|(?P<roman>i{1,3}|iv|v|vi{0,3}|x))\)")
+_INLINE_ROMAN = re.compile(r"(?i)\b\(?((?:i{1,3}|iv|v|vi{0,3}|x))\)\s+")
+_INLINE_LETTER = re.compile(r"(?i)\b\(?([a-d])\)\s+")
+_CLEAN_TAGS = re.compile(r"\[\d+(?:\s*[mM])?\]|\[CO\d+\]|\[L[1-6]\]")
+_CLEAN_MARKS = re.compile(r"\[(\d+)(?:\s*[mM])?\]")
+_CLEAN_CO = re.compile(r"\[CO\d+\]")
+_CLEAN_RBT = re.compile(r"\[L[1-6]\]")
+_WHITESPACE = re.compile(r"\s+")
+
+def _line_subparts(lines, candidates, kind):
+    """Resolve line-start subparts of one kind within a block.
+
+    Mirrors a multiline `^\\s*\\(?label\\)\\s+(.*)$` scan: the whitespace after the label may run
+    onto the next non-blank line, which then becomes the subpart text and is consumed.
+    """
+    found = []
+    consumed = -1
+    for idx, k, label, rest in candidates:
+        if k != kind or idx <= consumed:
+            continue
+        body = rest.strip()
+        if body:
+            if rest[0].isspace():
+                found.append({"label": label, "text": body})
+            continue
+        for nxt in range(idx + 1, len(lines)):
+            nxt_body = lines[nxt].strip()
+            if nxt_body:
+                found.append({"label": label, "text": nxt_body})
+                consumed = nxt
+                break
+    return found
+
+def _inline_subparts(pattern, inline):
+    matches = list(pattern.finditer(inline))
+    subparts = []
+    for idx, m in enumerate(matches):
+        end = matches[idx+1].start() if idx+1 < len(matches) else len(inline)
+        subparts.append({"label": m.group(1), "text": inline[m.end():end].strip()})
+    return subparts
+
+def _parse_block(lines, candidates, module):
+    b = '\n'.join(lines).strip()
+    # Single scan for module / marks / CO / RBT tags
+    mod_match = None
+    marks = None
+    rbt = None
+    co_tags = []
+    for tok in _TAG_TOKEN.finditer(b):
+        kind = tok.lastgroup
+        if kind == 'module':
+            if mod_match is None:
+                mod_match = tok
+        elif kind == 'marks':
+            if marks is None:
+                marks = int(tok.group('marks'))
+        elif kind == 'co':
+            co_tags.append(f"CO{tok.group('co')}")
+        elif rbt is None:
+            rbt = f"L{tok.group('rbt')}"
+    # Check for module in the format [Module X] or [M X] where X is 1-5
+    mod = module
+    if mod_match:
+        mod = int(mod_match.group('module_no'))
+        if mod < 1 or mod > 5:
+            mod = module  # Fall back to provided module if invalid
+
+    # Subparts: line-start lettered first, then roman; inline variants only when there are none
+    subparts = []
+    if candidates:
+        subparts = _line_subparts(lines, candidates, 'letter') + _line_subparts(lines, candidates, 'roman')
+    if not subparts and ')' in b:
+        inline = b.replace('\n', ' ')
+        subparts = _inline_subparts(_INLINE_ROMAN, inline) or _inline_subparts(_INLINE_LETTER, inline)
+
+    # Remove leading Qn. prefix and the module tag from text
+    main_text = _Q_PREFIX.sub("", b, count=1)
+    if mod_match:
+        main_text = main_text.replace(mod_match.group(0), '').strip()
+
+    return {
+        "text": main_text,
+        "marks": marks,
+        "co_tags": co_tags,
+        "rbt_level": rbt,
+        "subparts": subparts or None,
+        "q_type": "DESCRIPTIVE",
+        "module": mod
+    }
+
+def iter_bank_questions(chunks, module=None):
+    """Incrementally parse bank text supplied as an iterable of string chunks.
+
+    Each question dict is yielded as soon as the next Q<n>. header (or the end of the
+    input) closes its block, so only the current block is held in memory. The output is
+    the same as parse_bank_text("".join(chunks), module).
+    """
+    block = []
+    candidates = []
+    pending = ''
+    def take(line):
+        nonlocal block, candidates
+        # Every line is classified once: question header, subpart label or plain text
+        if _Q_HEADER.match(line):
+            if block:
+                done = _parse_block(block, candidates, module)
+                block, candidates = [line], []
+                return done
+        else:
+            sub = _LINE_SUBPART.match(line)
+            if sub:
+                kind = 'letter' if sub.group('letter') else 'roman'
+                candidates.append((len(block), kind, sub.group(kind), line[sub.end():]))
+        block.append(line)
+        return None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        data = pending + chunk
+        # Hold back a trailing \r in case the next chunk starts with the \n of a \r\n pair
+        tail = ''
+        if data.endswith('\r'):
+            data, tail = data[:-1], '\r'
+        lines = data.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        pending = lines.pop() + tail
+        for line in lines:
+            done = take(line)
+            if done is not None:
+                yield done
+    for line in pending.replace('\r', '\n').split('\n'):
+        done = take(line)
+        if done is not None:
+            yield done
+    yield _parse_block(block, candidates, module)
+
 def parse_bank_text(text, module=None):
-    # Normalize
-    lines = text.replace('\r\n', '\n').replace('\r', '\n')
-    # Split questions by Q<number>.
-    # Instead of split, we'll iterate line by line to avoid regex pitfalls
-    blocks = []
-    current = []
-    for line in lines.split('\n'):
-        if re.match(r"(?i)^Q\s*\d+\.", line.strip()):
-            if current:
-                blocks.append('\n'.join(current).strip())
-                current = []
-        current.append(line)
-    if current:
-        blocks.append('\n'.join(current).strip())
+    """Split bank text into Q<n>. blocks and parse each into a question dict.
 
-    parsed = []
-    for b in blocks:
-        # Check for module in the format [Module X] or [M X] where X is 1-5
-        mod = module
-        mod_match = re.search(r'\[\s*(?:Module|M)\s*(\d+)\]', b, re.IGNORECASE)
-        if mod_match:
-            mod = int(mod_match.group(1))
-            if mod < 1 or mod > 5:
-                mod = module  # Fall back to provided module if invalid
-        
-        # Marks [8M]
-        # Marks like [10] or [10M]
-        m = re.search(r"\[(\d+)(?:\s*[mM])?\]", b)
-        marks = int(m.group(1)) if m else None
-        # CO tags [CO4]
-        cos = re.findall(r"\[CO(\d+)\]", b)
-        co_tags = [f"CO{c}" for c in cos] if cos else []
-        # RBT [L2]
-        rbt = None
-        r = re.search(r"\[L([1-6])\]", b)
-        if r:
-            rbt = f"L{r.group(1)}"
-        # Subparts (lettered like a) or roman like i))
-        subparts = []
-        # 1) Line-start variants
-        pat_letter = re.compile(r"(?mi)^\s*\(?([a-d])\)\s+(.*)$")
-        pat_roman  = re.compile(r"(?mi)^\s*\(?((?:i{1,3}|iv|v|vi{0,3}|x))\)\s+(.*)$")
-        for m1 in pat_letter.finditer(b):
-            subparts.append({"label": m1.group(1), "text": m1.group(2).strip()})
-        for m2 in pat_roman.finditer(b):
-            subparts.append({"label": m2.group(1), "text": m2.group(2).strip()})
-        # 2) Inline variants within the same line (e.g., "... i) text ... ii) text ...")
-        if not subparts:
-            inline = b.replace('\n', ' ')
-            # Build a list of (label, start_index) for roman numerals inline
-            matches = list(re.finditer(r"(?i)\b\(?((?:i{1,3}|iv|v|vi{0,3}|x))\)\s+", inline))
-            if matches:
-                for idx, m in enumerate(matches):
-                    label = m.group(1)
-                    start = m.end()
-                    end = matches[idx+1].start() if idx+1 < len(matches) else len(inline)
-                    subparts.append({"label": label, "text": inline[start:end].strip()})
-            else:
-                # Try lettered inline a) b)
-                matches = list(re.finditer(r"(?i)\b\(?([a-d])\)\s+", inline))
-                if matches:
-                    for idx, m in enumerate(matches):
-                        label = m.group(1)
-                        start = m.end()
-                        end = matches[idx+1].start() if idx+1 < len(matches) else len(inline)
-                        subparts.append({"label": label, "text": inline[start:end].strip()})
-        # Remove leading Qn. prefix from text
-        main_text = re.sub(r"(?i)^Q\s*\d+\.?\s*", "", b.strip())
-        # Remove module tag from text if it exists
-        if mod_match:
-            main_text = main_text.replace(mod_match.group(0), '').strip()
-        
-        parsed.append({
-            "text": main_text,
-            "marks": marks,
-            "co_tags": co_tags,
-            "rbt_level": rbt,
-            "subparts": subparts or None,
-            "q_type": "DESCRIPTIVE",
-            "module": mod
-        })
-    return parsed
+    Lines are classified once while the blocks are being split; tags are then read from
+    each block in a single scan (see iter_bank_questions for the streaming form).
+    """
+    return list(iter_bank_questions((text,), module))
 
 def clean_question_text(s: str) -> str:
     if not s:
         return s
-    # Remove marks like [10] or [10M]
-    s = re.sub(r"\[(\d+)(?:\s*[mM])?\]", "", s)
-    # Remove CO tags like [CO4]
-    s = re.sub(r"\[CO\d+\]", "", s)
-    # Remove RBT tags like [L2]
-    s = re.sub(r"\[L[1-6]\]", "", s)
+    # Remove marks [10]/[10M], CO tags [CO4] and RBT tags [L2] in one pass
+    out = _CLEAN_TAGS.sub("", s)
+    if '[' in out:
+        # Leftover brackets may nest around tags; apply the removals in their original order
+        out = _CLEAN_RBT.sub("", _CLEAN_CO.sub("", _CLEAN_MARKS.sub("", s)))
     # Collapse extra spaces
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _WHITESPACE.sub(" ", out).strip()
+
+def normalize_question_text(s):
+    """Text used to decide whether two questions are the same (tags removed, lowercased)."""
+    return (clean_question_text(s or '') or '').lower().strip()
+
+def question_fingerprint(s):
+    # Stored on Question.text_fingerprint; after changing how questions are normalized run
+    # backfill_question_fingerprints(conn, force=True) in a db.engine.begin() block
+    return hashlib.sha1(normalize_question_text(s).encode('utf-8')).hexdigest()
+
+def pool_question_fingerprint(q):
+    """Fingerprint of a PoolQuestion, computed for rows that predate the stored column."""
+    return q.text_fingerprint or question_fingerprint(q.text)
+
+def question_matches(q, ids, texts):
+    """Whether a PoolQuestion is one of `ids` or repeats the text of one of `texts` (fingerprints)."""
+    return q.id in ids or pool_question_fingerprint(q) in texts
+
+def backfill_question_fingerprints(conn, force=False, batch_size=1000):
+    """Fill text_fingerprint for rows missing it (or every row with force=True); migration 6."""
+    questions = Question.__table__
+    updated = 0
+    last_id = 0
+    while True:
+        q = db.select(questions.c.id, questions.c.text).where(questions.c.id > last_id)
+        if not force:
+            q = q.where(questions.c.text_fingerprint.is_(None))
+        rows = conn.execute(q.order_by(questions.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        conn.execute(
+            db.update(questions).where(questions.c.id == db.bindparam('qid')),
+            [{'qid': qid, 'text_fingerprint': question_fingerprint(text)} for qid, text in rows]
+        )
+        updated += len(rows)
+        last_id = rows[-1][0]
+    return updated
+
+# -------- Bulk question persistence --------
+def question_row_from_parsed(item, scheme_id, subject_id, module, source_file):
+    """Column values for a questions row built from a parse_bank_text item."""
+    return {
+        'scheme_id': scheme_id,
+        'subject_id': subject_id,
+        'q_type': item.get('q_type') or 'DESCRIPTIVE',
+        'text': item.get('text') or '',
+        'text_fingerprint': question_fingerprint(item.get('text')),
+        'marks': item.get('marks'),
+        'co_tags': item.get('co_tags') or [],
+        'rbt_level': item.get('rbt_level'),
+        'subparts': item.get('subparts'),
+        'module': module,
+        'status': QuestionStatus.DRAFT,
+        'parse_confidence': 0.6 if (item.get('marks') or item.get('co_tags') or item.get('rbt_level')) else 0.3,
+        'source_file': source_file,
+    }
+
+def bulk_insert_questions(rows, batch_size=None):
+    """Insert question rows (dicts of column values) with executemany-style Core inserts.
+
+    Rows are consumed lazily and sent in batches of `batch_size`, skipping the ORM
+    unit of work entirely. Runs in the caller's transaction; returns the row count.
+    """
+    batch_size = batch_size or app.config["INGEST_BATCH_SIZE"]
+    stmt = db.insert(Question.__table__)
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(stmt, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(stmt, batch)
+        count += len(batch)
+    return count
+
+def _co_tag_rows(rows):
+    for qid, co_tags in rows:
+        for co in {str(co) for co in (co_tags or []) if co}:
+            yield {'question_id': qid, 'co': co}
+
+def delete_question_co_tags(*criteria):
+    """Drop the CO tag rows of the questions matching `criteria`; run before deleting those questions."""
+    tags = QuestionCoTag.__table__
+    db.session.execute(db.delete(tags).where(tags.c.question_id.in_(db.select(Question.id).where(*criteria))))
+
+def sync_question_co_tags(*criteria):
+    """Rewrite question_co_tags from co_tags for the questions matching `criteria`; the caller commits."""
+    delete_question_co_tags(*criteria)
+    rows = list(_co_tag_rows(db.session.execute(db.select(Question.id, Question.co_tags).where(*criteria))))
+    if rows:
+        db.session.execute(db.insert(QuestionCoTag.__table__), rows)
+    return len(rows)
+
+def backfill_question_co_tags(conn, batch_size=1000):
+    """Fill question_co_tags for questions saved before the table existed (migration 5)."""
+    questions = Question.__table__
+    tagged = db.select(QuestionCoTag.__table__.c.question_id)
+    count = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            db.select(questions.c.id, questions.c.co_tags)
+            .where(questions.c.id > last_id, questions.c.id.not_in(tagged))
+            .order_by(questions.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        tag_rows = list(_co_tag_rows(rows))
+        if tag_rows:
+            conn.execute(db.insert(QuestionCoTag.__table__), tag_rows)
+        count += len(tag_rows)
+        last_id = rows[-1][0]
+    return count
+
+# -------- Question bank ingestion --------
+# PDF extraction is CPU bound, so page ranges run in a bounded process pool. Each upload
+# becomes an IngestJob driven by a small thread pool that parses pages as they stream
+# back and talks to the DB.
+_ingest_lock = threading.Lock()
+_ingest_process_pool = None
+_ingest_job_runner = None
+
+def _get_ingest_pools():
+    global _ingest_process_pool, _ingest_job_runner
+    with _ingest_lock:
+        if _ingest_process_pool is None:
+            _ingest_process_pool = ProcessPoolExecutor(max_workers=app.config["INGEST_MAX_WORKERS"])
+        if _ingest_job_runner is None:
+            _ingest_job_runner = ThreadPoolExecutor(max_workers=app.config["INGEST_MAX_JOBS"], thread_name_prefix="ingest")
+    return _ingest_process_pool, _ingest_job_runner
+
+def _count_pdf_pages(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+def _pdfplumber_page_texts(path, pages):
+    """Extract the given 0-based page indexes with pdfplumber, in order."""
+    texts = []
+    with pdfplumber.open(path, pages=[i + 1 for i in pages]) as pdf:
+        for p in pdf.pages:
+            texts.append(p.extract_text() or '')
+            p.flush_cache()
+    return texts
+
+def _pdfium_page_texts(path, pages):
+    """Extract the given 0-based page indexes with pypdfium2's native text layer.
+
+    pdfium ends lines with "\r\n" and keeps trailing spaces; both are normalised to
+    match pdfplumber so the parser sees the same shape of text.
+    """
+    import pypdfium2 as pdfium  # installed with pdfplumber; imported lazily in the worker
+    texts = []
+    doc = pdfium.PdfDocument(path)
+    try:
+        for i in pages:
+            page = doc[i]
+            textpage = page.get_textpage()
+            raw = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            lines = raw.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+            texts.append('\n'.join(line.rstrip() for line in lines).strip('\n'))
+    finally:
+        doc.close()
+    empty = [i for i, text in zip(pages, texts) if not text.strip()]
+    if empty:
+        # Pages pdfium reads as blank (odd encodings, form XObjects) get a second try with pdfplumber
+        redone = dict(zip(empty, _pdfplumber_page_texts(path, empty)))
+        texts = [redone.get(i, text) for i, text in zip(pages, texts)]
+    return texts
+
+PDF_EXTRACTORS = {
+    'pdfplumber': _pdfplumber_page_texts,
+    'pdfium': _pdfium_page_texts,
+}
+
+def _extract_page_range(path, start, end, backend='pdfplumber'):
+    """Runs in a worker process: extract text for pages [start, end) of the PDF."""
+    return PDF_EXTRACTORS[backend](path, list(range(start, end)))
+
+def _split_page_ranges(page_count, workers, max_pages=None):
+    """Split page indexes into contiguous (start, end) ranges spread over `workers`.
+
+    Ranges are capped at `max_pages` so a long PDF streams through the pool in
+    small pieces instead of one huge range per worker.
+    """
+    if page_count <= 0:
+        return []
+    workers = max(1, min(workers, page_count))
+    size = -(-page_count // workers)
+    if max_pages:
+        size = min(size, max_pages)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def iter_pdf_pages(path, workers=None, executor=None, page_count=None, on_progress=None, backend=None):
+    """Yield the text of each page in page order.
+
+    Page ranges are extracted by worker processes with at most `workers` ranges in
+    flight, so memory is bounded by the window rather than the size of the PDF.
+    `on_progress(pages_done)` is called as ranges finish. `backend` names an entry
+    of PDF_EXTRACTORS and defaults to PDF_EXTRACT_BACKEND.
+    """
+    workers = workers or app.config["PDF_EXTRACT_WORKERS"]
+    backend = backend or app.config["PDF_EXTRACT_BACKEND"]
+    if backend not in PDF_EXTRACTORS:
+        raise ValueError(f"Unknown PDF extraction backend: {backend}")
+    if executor is None and workers <= 1 and backend != 'pdfplumber':
+        if page_count is None:
+            page_count = _count_pdf_pages(path)
+        pages_done = 0
+        for start, end in _split_page_ranges(page_count, 1, app.config["PDF_EXTRACT_CHUNK_PAGES"]):
+            texts = _extract_page_range(path, start, end, backend)
+            pages_done += end - start
+            if on_progress:
+                on_progress(pages_done)
+            yield from texts
+        return
+    if executor is None and workers <= 1:
+        with pdfplumber.open(path) as pdf:
+            for done, p in enumerate(pdf.pages, start=1):
+                text = p.extract_text() or ''
+                p.flush_cache()
+                if on_progress:
+                    on_progress(done)
+                yield text
+        return
+    if page_count is None:
+        page_count = _count_pdf_pages(path)
+    ranges = iter(_split_page_ranges(page_count, workers, app.config["PDF_EXTRACT_CHUNK_PAGES"]))
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    window = deque()
+    try:
+        for start, end in islice(ranges, workers):
+            window.append((end - start, executor.submit(_extract_page_range, path, start, end, backend)))
+        pages_done = 0
+        while window:
+            count, fut = window.popleft()
+            texts = fut.result()
+            nxt = next(ranges, None)
+            if nxt is not None:
+                window.append((nxt[1] - nxt[0], executor.submit(_extract_page_range, path, nxt[0], nxt[1], backend)))
+            pages_done += count
+            if on_progress:
+                on_progress(pages_done)
+            yield from texts
+    finally:
+        for _, fut in window:
+            fut.cancel()
+        if own_executor:
+            executor.shutdown()
+
+def extract_pdf_text(path, workers=None, executor=None, page_count=None, on_progress=None, backend=None):
+    """Extract the whole PDF as one string, joined like "\\n".join over pdf.pages."""
+    return "\n".join(iter_pdf_pages(path, workers, executor, page_count, on_progress, backend))
+
+def _join_pages(pages):
+    """Stream pages as chunks of "\\n".join(pages) without building the joined string."""
+    first = True
+    for text in pages:
+        if not first:
+            yield "\n"
+        first = False
+        yield text
+
+def _ingest_job_to_json(job: 'IngestJob'):
+    return {
+        'id': job.id,
+        'status': job.status.value,
+        'module': job.module,
+        'file_name': job.file_name,
+        'pages_total': job.pages_total or 0,
+        'pages_done': job.pages_done or 0,
+        'questions_parsed': job.questions_parsed or 0,
+        'bank_id': job.bank_id,
+        'batch_id': job.batch_id,
+        'warnings': job.warnings or [],
+        'errors': job.errors or [],
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+def _update_ingest_job(job, **fields):
+    for k, v in fields.items():
+        setattr(job, k, v)
+    db.session.commit()
+
+def _fail_ingest_job(job, message):
+    db.session.rollback()
+    for path in (job.file_path, _bank_text_path(job.file_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    _update_ingest_job(job, status=IngestJobStatus.FAILED, errors=[message])
+
+def fail_interrupted_ingest_jobs():
+    """Mark jobs left QUEUED or RUNNING by a previous process FAILED and remove their files.
+
+    The job queue lives in memory only, so nothing resumes these after a restart; call
+    this once at start-up, before any upload is accepted. Returns how many were failed.
+    """
+    jobs = IngestJob.query.filter(IngestJob.status.in_([IngestJobStatus.QUEUED, IngestJobStatus.RUNNING])).all()
+    for job in jobs:
+        _fail_ingest_job(job, "Interrupted by a server restart; upload the file again")
+    return len(jobs)
+
+def _question_bank_dest(filename):
+    """Upload path with a timestamp prefix, made unique when a batch repeats a name."""
+    timestamp = int(datetime.utcnow().timestamp())
+    dest = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{filename}")
+    n = 1
+    while os.path.exists(dest):
+        dest = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{n}_{filename}")
+        n += 1
+    return dest
+
+def _save_upload(f, dest, chunk_size=1024 * 1024):
+    """Write an uploaded file to dest, returning the SHA-256 of its bytes."""
+    digest = hashlib.sha256()
+    with open(dest, 'wb') as out:
+        while True:
+            chunk = f.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+# Cache layout: <sha256>.txt.gz holds the extracted text and <sha256>.m<module>.p<parser>.jsonl.gz
+# the parse result (a {"pages": n} header line, then one question per line). Backends other
+# than pdfplumber add their name to both keys. Entries are touched on every hit so mtime
+# order is LRU order.
+def _ingest_cache_path(digest, suffix):
+    return os.path.join(app.config["INGEST_CACHE_DIR"], f"{digest}.{suffix}")
+
+def _backend_cache_prefix():
+    backend = app.config["PDF_EXTRACT_BACKEND"]
+    return '' if backend == 'pdfplumber' else f"{backend}."
+
+def _text_cache_suffix():
+    return f"{_backend_cache_prefix()}txt.gz"
+
+def _parsed_cache_suffix(module):
+    return f"{_backend_cache_prefix()}m{module}.p{PARSER_VERSION}.jsonl.gz"
+
+def _ingest_cache_open(digest, suffix):
+    """Open a cache entry for streaming reads, or return None on a miss."""
+    path = _ingest_cache_path(digest, suffix)
+    try:
+        fh = gzip.open(path, 'rt', encoding='utf-8')
+        os.utime(path)
+        return fh
+    except OSError:
+        return None
+
+def _publish_ingest_cache(digest, suffix, src):
+    """Copy a finished gzip file (open in binary mode) into the cache.
+
+    Best effort: an unwritable or full cache directory only costs a later cache hit.
+    """
+    path = _ingest_cache_path(digest, suffix)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(app.config["INGEST_CACHE_DIR"], exist_ok=True)
+        src.seek(0)
+        with open(tmp, 'wb') as out:
+            shutil.copyfileobj(src, out)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+def _evict_ingest_cache():
+    cache_dir = app.config["INGEST_CACHE_DIR"]
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith('.gz'):
+            continue
+        try:
+            st = os.stat(os.path.join(cache_dir, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+        total += st.st_size
+    entries.sort()
+    for _, size, name in entries:
+        if total <= app.config["INGEST_CACHE_MAX_BYTES"]:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except OSError:
+            pass
+        total -= size
+
+def _tee_chunks(chunks, out):
+    for chunk in chunks:
+        out.write(chunk)
+        yield chunk
+
+def _spool_parsed_questions(job, pool, digest):
+    """Stream PDF pages through the incremental parser into a job-private spool file.
+
+    Text comes from the text cache when these bytes were extracted before, otherwise from
+    iter_pdf_pages; either way it is written to the bank's text sidecar on the way through.
+    The spool lives outside the cache directory, so eviction by other jobs cannot touch it,
+    and is copied into the cache afterwards. Returns the spool (gzip, binary).
+    """
+    pages_total = pool.submit(_count_pdf_pages, job.file_path).result()
+    _update_ingest_job(job, pages_total=pages_total)
+    parsed = 0
+    def progress(done):
+        _update_ingest_job(job, pages_done=done, questions_parsed=parsed)
+    cached_text = _ingest_cache_open(digest, _text_cache_suffix())
+    sidecar = _bank_text_path(job.file_path)
+    sidecar_tmp = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+    spool = tempfile.TemporaryFile(prefix="questgen_ingest_")
+    try:
+        with io.TextIOWrapper(gzip.GzipFile(fileobj=spool, mode='wb'), encoding='utf-8') as out, \
+                gzip.open(sidecar_tmp, 'wt', encoding='utf-8') as text_out:
+            out.write(json.dumps({'pages': pages_total}) + "\n")
+            if cached_text is not None:
+                progress(pages_total)
+                chunks = iter(lambda: cached_text.read(64 * 1024), '')
+            else:
+                chunks = _join_pages(iter_pdf_pages(job.file_path, executor=pool, page_count=pages_total, on_progress=progress))
+            for item in iter_bank_questions(_tee_chunks(chunks, text_out), job.module):
+                out.write(json.dumps(item) + "\n")
+                parsed += 1
+        os.replace(sidecar_tmp, sidecar)
+    except BaseException:
+        spool.close()
+        if os.path.exists(sidecar_tmp):
+            os.remove(sidecar_tmp)
+        raise
+    finally:
+        if cached_text is not None:
+            cached_text.close()
+    _update_ingest_job(job, pages_done=pages_total, questions_parsed=parsed)
+    _publish_ingest_cache(digest, _parsed_cache_suffix(job.module), spool)
+    if cached_text is None:
+        with open(sidecar, 'rb') as fh:
+            _publish_ingest_cache(digest, _text_cache_suffix(), fh)
+    spool.seek(0)
+    return spool
+
+def _read_spooled_questions(fh, *owned):
+    """(pages, items) from an open parsed-questions file; `owned` files are closed with it."""
+    header = json.loads(fh.readline())
+    def items():
+        try:
+            for line in fh:
+                yield json.loads(line)
+        finally:
+            fh.close()
+            for f in owned:
+                f.close()
+    return header['pages'], items()
+
+# Every bank keeps its extracted text next to the PDF as <file_path>.txt.gz so it can be
+# reparsed after parser changes without extracting the PDF again.
+def _bank_text_path(file_path):
+    return f"{file_path}.txt.gz"
+
+def _store_bank_text(file_path, digest):
+    """Copy the cached extracted text of an upload into the bank's sidecar, if still cached."""
+    src = _ingest_cache_path(digest, _text_cache_suffix())
+    try:
+        shutil.copyfile(src, _bank_text_path(file_path))
+    except OSError:
+        pass  # evicted meanwhile; reparse queues extraction and writes the sidecar then
+
+# Banks stored before sidecars existed (or whose copy was evicted) get their text extracted
+# once in the background on the shared pools; reparse skips them until the sidecar exists.
+_bank_text_pending = set()  # file paths queued or being extracted
+_bank_text_errors = {}  # file path -> extraction error, reported by the next reparse
+
+def _write_bank_text(file_path, pool):
+    path = _bank_text_path(file_path)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with gzip.open(tmp, 'wt', encoding='utf-8') as out:
+            for chunk in _join_pages(iter_pdf_pages(file_path, executor=pool)):
+                out.write(chunk)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _run_bank_text_extraction(file_paths):
+    """Runs on the job runner: extract each stored PDF into its missing text sidecar."""
+    pool, _ = _get_ingest_pools()
+    for file_path in file_paths:
+        try:
+            if os.path.exists(file_path) and not os.path.exists(_bank_text_path(file_path)):
+                _write_bank_text(file_path, pool)
+        except Exception as e:
+            with _ingest_lock:
+                _bank_text_errors[file_path] = str(e)
+        finally:
+            with _ingest_lock:
+                _bank_text_pending.discard(file_path)
+
+def queue_bank_text_extraction(banks):
+    """Queue background extraction for banks that have a PDF but no stored text yet.
+
+    Returns (extracting, failed): the banks still waiting for their text, and
+    (bank, message) for banks whose last extraction failed (queued again next time).
+    """
+    waiting = [b for b in banks if not os.path.exists(_bank_text_path(b.file_path)) and os.path.exists(b.file_path)]
+    extracting, failed, queue = [], [], []
+    with _ingest_lock:
+        for bank in waiting:
+            error = _bank_text_errors.pop(bank.file_path, None)
+            if error is not None:
+                failed.append((bank, error))
+                continue
+            extracting.append(bank)
+            if bank.file_path not in _bank_text_pending:
+                _bank_text_pending.add(bank.file_path)
+                queue.append(bank.file_path)
+    if queue:
+        _, runner = _get_ingest_pools()
+        runner.submit(_run_bank_text_extraction, queue)
+    return extracting, failed
+
+def _open_bank_text(bank):
+    path = _bank_text_path(bank.file_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No stored text or PDF for {bank.file_name}")
+    return gzip.open(path, 'rt', encoding='utf-8')
+
+def parse_bank_question_rows(bank):
+    """Question rows from a fresh parse of the bank's stored text.
+
+    Runs before any write, so parsing never holds the database write lock.
+    """
+    source_file = os.path.basename(bank.file_path)
+    with _open_bank_text(bank) as fh:
+        return [
+            question_row_from_parsed(item, bank.scheme_id, bank.subject_id, bank.module, source_file)
+            for item in iter_bank_questions(iter(lambda: fh.read(64 * 1024), ''), bank.module)
+        ]
+
+def replace_bank_questions(bank, rows):
+    """Replace the bank's questions with pre-parsed rows.
+
+    Adds the delete and bulk insert to the current transaction and returns
+    (removed, inserted); the caller commits.
+    """
+    source_file = os.path.basename(bank.file_path)
+    delete_question_co_tags(Question.source_file == source_file)
+    removed = Question.query.filter_by(source_file=source_file).delete(synchronize_session=False)
+    inserted = bulk_insert_questions(rows)
+    sync_question_co_tags(Question.source_file == source_file)
+    bank.question_count = inserted
+    bump_question_pool_version(bank.scheme_id, bank.subject_id)
+    return removed, inserted
+
+def _prepare_ingest_job(job, pool, digest):
+    """Parse this upload (or reuse the cached parse of identical bytes); returns an item iterator."""
+    cached = _ingest_cache_open(digest, _parsed_cache_suffix(job.module))
+    if cached is not None:
+        # Identical bytes were ingested before: skip extraction and parsing entirely. The
+        # open handle keeps the entry readable even if it is evicted meanwhile.
+        pages, items = _read_spooled_questions(cached)
+        _update_ingest_job(job, pages_total=pages, pages_done=pages)
+        _store_bank_text(job.file_path, digest)
+        return items
+    spool = _spool_parsed_questions(job, pool, digest)
+    _, items = _read_spooled_questions(io.TextIOWrapper(gzip.GzipFile(fileobj=spool, mode='rb'), encoding='utf-8'), spool)
+    return items
+
+def _insert_ingested_bank(job, parsed_items):
+    """Add the QuestionBank and its questions for a prepared job to the current transaction."""
+    file_name = os.path.basename(job.file_path)
+    qb = QuestionBank(
+        scheme_id=job.scheme_id,
+        subject_id=job.subject_id,
+        module=job.module,
+        file_name=job.file_name,
+        file_path=job.file_path,
+        question_count=0
+    )
+    db.session.add(qb)
+    db.session.flush()  # Get the ID for the question bank
+
+    # Questions are streamed from the spool and inserted in fixed-size batches
+    count = bulk_insert_questions(
+        question_row_from_parsed(item, job.scheme_id, job.subject_id, job.module, file_name)
+        for item in parsed_items
+    )
+    sync_question_co_tags(Question.source_file == file_name)
+
+    qb.question_count = count
+    bump_question_pool_version(job.scheme_id, job.subject_id)
+    job.bank_id = qb.id
+    job.questions_parsed = count
+    job.status = IngestJobStatus.DONE
+    return qb
+
+def _run_ingest_job(job_id, digest):
+    with app.app_context():
+        job = IngestJob.query.get(job_id)
+        if job is None:
+            return
+        pool, _ = _get_ingest_pools()
+        _update_ingest_job(job, status=IngestJobStatus.RUNNING)
+        try:
+            parsed_items = _prepare_ingest_job(job, pool, digest)
+        except Exception as e:
+            _fail_ingest_job(job, f"Failed to parse PDF: {e}")
+            return
+
+        try:
+            _insert_ingested_bank(job, parsed_items)
+            db.session.commit()
+        except Exception as e:
+            _fail_ingest_job(job, f"Failed to save questions: {str(e)}")
+        finally:
+            parsed_items.close()
+            _evict_ingest_cache()
+
+def _prepare_batch_file(job_id, digest):
+    """Runs in its own thread: extract and parse one file of a batch, recording failures."""
+    with app.app_context():
+        job = IngestJob.query.get(job_id)
+        pool, _ = _get_ingest_pools()
+        _update_ingest_job(job, status=IngestJobStatus.RUNNING)
+        try:
+            return _prepare_ingest_job(job, pool, digest)
+        except Exception as e:
+            _fail_ingest_job(job, f"Failed to parse PDF: {e}")
+            return None
+
+def _run_ingest_batch(job_ids, digests):
+    """Extract and parse every file of a batch concurrently, then commit all banks at once.
+
+    Files that fail to extract or parse are reported on their own job and left out;
+    the remaining banks and questions are saved in a single transaction.
+    """
+    # At most INGEST_MAX_JOBS files are extracted at once, however large the batch
+    workers = min(len(job_ids), app.config["INGEST_MAX_JOBS"])
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-batch") as files:
+        prepared = list(files.map(_prepare_batch_file, job_ids, digests))
+    with app.app_context():
+        jobs = [IngestJob.query.get(job_id) for job_id in job_ids]
+        ready = [(job, items) for job, items in zip(jobs, prepared) if items is not None]
+        try:
+            for job, items in ready:
+                _insert_ingested_bank(job, items)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for job, _ in ready:
+                _fail_ingest_job(job, f"Failed to save questions: {str(e)}")
+        finally:
+            for _, items in ready:
+                items.close()
+            _evict_ingest_cache()
 
 # -------- Scheduling Helpers --------
 def _parse_iso(dt_str):
@@ -615,73 +1611,126 @@ def upload_question_bank():
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Save the file with a timestamp prefix
-    timestamp = int(datetime.utcnow().timestamp())
-    file_name = f"{timestamp}_{f.filename}"
-    dest = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
-    f.save(dest)
-
-    # Parse the PDF
-    warnings = []
-    parsed_items = []
-    try:
-        with pdfplumber.open(dest) as pdf:
-            all_text = "\n".join([p.extract_text() or '' for p in pdf.pages])
-        parsed_items = parse_bank_text(all_text, module=module)
-    except Exception as e:
-        # Clean up the file if parsing fails
-        if os.path.exists(dest):
-            os.remove(dest)
-        return jsonify({"errors": [f"Failed to parse PDF: {e}"]}), 500
+    dest = _question_bank_dest(f.filename)
+    digest = _save_upload(f, dest)
 
-    # Start a transaction
+    # Extraction, parsing and inserts happen in the background; the client polls the job
     try:
-        # Create a record for the question bank
-        qb = QuestionBank(
+        job = IngestJob(
             scheme_id=scheme_id,
             subject_id=subject_id,
             module=module,
             file_name=f.filename,
             file_path=dest,
-            question_count=len(parsed_items)
+            status=IngestJobStatus.QUEUED,
+            warnings=[],
+            errors=[]
         )
-        db.session.add(qb)
-        db.session.flush()  # Get the ID for the question bank
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(dest):
+            os.remove(dest)
+        return jsonify({"errors": [f"Failed to queue question bank: {str(e)}"]}), 500
 
-        # Add all questions
-        for item in parsed_items:
-            q = Question(
+    _, runner = _get_ingest_pools()
+    runner.submit(_run_ingest_job, job.id, digest)
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status.value,
+        "status_url": f"/api/ingest-jobs/{job.id}",
+        "file_name": f.filename,
+        "module": module,
+        "warnings": [],
+        "errors": []
+    }), 202
+
+@app.route('/api/upload-question-banks', methods=['POST'])
+def upload_question_banks():
+    """Upload several module banks at once; `files` and `modules` are parallel lists."""
+    scheme_id = request.form.get('scheme_id', type=int)
+    subject_id = request.form.get('subject_id', type=int)
+    files = request.files.getlist('files')
+    modules = request.form.getlist('modules', type=int)
+
+    if not (scheme_id and subject_id and files):
+        return jsonify({"errors": ["scheme_id, subject_id, and files are required"]}), 400
+    if len(modules) != len(files):
+        return jsonify({"errors": ["one module number is required per file"]}), 400
+
+    # Validate each file on its own so one bad entry does not reject the whole batch
+    accepted = []
+    rejected = []
+    for f, module in zip(files, modules):
+        if module < 1 or module > 5:
+            rejected.append({"file_name": f.filename, "module": module, "errors": ["module must be between 1 and 5"]})
+        elif not f.filename.lower().endswith('.pdf'):
+            rejected.append({"file_name": f.filename, "module": module, "errors": ["Only PDF files are allowed"]})
+        else:
+            accepted.append((f, module))
+    if not accepted:
+        return jsonify({"errors": ["No valid files in batch"], "files": rejected}), 400
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    batch_id = uuid.uuid4().hex
+    jobs = []
+    digests = []
+    saved = []
+    try:
+        for f, module in accepted:
+            dest = _question_bank_dest(f.filename)
+            saved.append(dest)
+            digests.append(_save_upload(f, dest))
+            job = IngestJob(
                 scheme_id=scheme_id,
                 subject_id=subject_id,
-                q_type=item.get('q_type') or 'DESCRIPTIVE',
-                text=item.get('text') or '',
-                marks=item.get('marks'),
-                co_tags=item.get('co_tags') or [],
-                rbt_level=item.get('rbt_level'),
-                subparts=item.get('subparts'),
-                module=module,  # Use the explicitly provided module
-                status=QuestionStatus.DRAFT,
-                parse_confidence=0.6 if (item.get('marks') or item.get('co_tags') or item.get('rbt_level')) else 0.3,
-                source_file=file_name
+                module=module,
+                file_name=f.filename,
+                file_path=dest,
+                status=IngestJobStatus.QUEUED,
+                batch_id=batch_id,
+                warnings=[],
+                errors=[]
             )
-            db.session.add(q)
-        
+            db.session.add(job)
+            jobs.append(job)
         db.session.commit()
-        
-        return jsonify({
-            "id": qb.id,
-            "file_name": f.filename,
-            "module": module,
-            "question_count": len(parsed_items),
-            "uploaded_at": qb.uploaded_at.isoformat(),
-            "warnings": warnings,
-            "errors": []
-        }), 201
-        
     except Exception as e:
         db.session.rollback()
-        if os.path.exists(dest):
-            os.remove(dest)
-        return jsonify({"errors": [f"Failed to save questions: {str(e)}"]}), 500
+        for dest in saved:
+            if os.path.exists(dest):
+                os.remove(dest)
+        return jsonify({"errors": [f"Failed to queue question banks: {str(e)}"]}), 500
+
+    _, runner = _get_ingest_pools()
+    runner.submit(_run_ingest_batch, [job.id for job in jobs], digests)
+    return jsonify({
+        "batch_id": batch_id,
+        "status_url": f"/api/ingest-batches/{batch_id}",
+        "jobs": [_ingest_job_to_json(job) for job in jobs],
+        "rejected": rejected,
+        "errors": []
+    }), 202
+
+@app.route('/api/ingest-jobs/<int:job_id>', methods=['GET'])
+def get_ingest_job(job_id: int):
+    job = IngestJob.query.get_or_404(job_id)
+    return jsonify(_ingest_job_to_json(job))
+
+@app.route('/api/ingest-batches/<batch_id>', methods=['GET'])
+def get_ingest_batch(batch_id):
+    jobs = IngestJob.query.filter_by(batch_id=batch_id).order_by(IngestJob.id).all()
+    if not jobs:
+        return jsonify({"errors": ["Batch not found"]}), 404
+    finished = all(j.status in (IngestJobStatus.DONE, IngestJobStatus.FAILED) for j in jobs)
+    return jsonify({
+        "batch_id": batch_id,
+        "status": "DONE" if finished else "RUNNING",
+        "done": sum(1 for j in jobs if j.status == IngestJobStatus.DONE),
+        "failed": sum(1 for j in jobs if j.status == IngestJobStatus.FAILED),
+        "jobs": [_ingest_job_to_json(j) for j in jobs],
+    })
 
 @app.route('/api/question-banks', methods=['GET'])
 def list_question_banks():
@@ -713,19 +1762,91 @@ def get_question_bank_file(bank_id: int):
         return jsonify({"errors": ["File not found on server"]}), 404
     return send_file(bank.file_path, mimetype='application/pdf', as_attachment=False, download_name=bank.file_name)
 
+@app.route('/api/question-banks/<int:bank_id>/reparse', methods=['POST'])
+def reparse_question_bank_route(bank_id: int):
+    """Re-run the parser on a bank's stored text and replace its questions (202 while the text is extracted)"""
+    bank = QuestionBank.query.get_or_404(bank_id)
+    extracting, failed = queue_bank_text_extraction([bank])
+    if extracting:
+        return jsonify({'id': bank.id, 'status': 'EXTRACTING', 'errors': []}), 202
+    if failed:
+        return jsonify({"errors": [f"Failed to extract {bank.file_name}: {failed[0][1]}"]}), 500
+    try:
+        rows = parse_bank_question_rows(bank)
+    except FileNotFoundError as e:
+        return jsonify({"errors": [str(e)]}), 404
+    except Exception as e:
+        return jsonify({"errors": [f"Failed to reparse question bank: {str(e)}"]}), 500
+    try:
+        removed, inserted = replace_bank_questions(bank, rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"errors": [f"Failed to reparse question bank: {str(e)}"]}), 500
+    return jsonify({'id': bank.id, 'removed': removed, 'question_count': inserted, 'errors': []})
+
+@app.route('/api/question-banks/reparse', methods=['POST'])
+def reparse_question_banks():
+    """Reparse every bank of a scheme (optionally one subject) in a single transaction"""
+    data = request.get_json(silent=True) or {}
+    scheme_id = data.get('scheme_id')
+    subject_id = data.get('subject_id')
+    if not scheme_id:
+        return jsonify({"errors": ["scheme_id is required"]}), 400
+    q = QuestionBank.query.filter_by(scheme_id=scheme_id)
+    if subject_id:
+        q = q.filter_by(subject_id=subject_id)
+
+    # Banks without stored text are extracted in the background and reparsed on a later call
+    banks = q.order_by(QuestionBank.id).all()
+    extracting, failed = queue_bank_text_extraction(banks)
+    errors = [f"Failed to extract {bank.file_name}: {message}" for bank, message in failed]
+    skip = {bank.id for bank in extracting} | {bank.id for bank, _ in failed}
+
+    # Parse every bank up front so the write transaction only deletes and inserts
+    parsed = []
+    try:
+        for bank in banks:
+            if bank.id in skip:
+                continue
+            try:
+                parsed.append((bank, parse_bank_question_rows(bank)))
+            except FileNotFoundError as e:
+                # Leave this bank untouched and carry on with the rest
+                errors.append(str(e))
+    except Exception as e:
+        return jsonify({"errors": [f"Failed to reparse question banks: {str(e)}"]}), 500
+
+    results = []
+    try:
+        for bank, rows in parsed:
+            removed, inserted = replace_bank_questions(bank, rows)
+            results.append({'id': bank.id, 'removed': removed, 'question_count': inserted})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"errors": [f"Failed to reparse question banks: {str(e)}"]}), 500
+    return jsonify({'banks': results, 'extracting': [bank.id for bank in extracting], 'errors': errors})
+
 @app.route('/api/question-banks/<int:bank_id>', methods=['DELETE'])
 def delete_question_bank(bank_id):
     """Delete a question bank and all its questions"""
     bank = QuestionBank.query.get_or_404(bank_id)
     
     try:
-        # Delete the file if it exists
-        if os.path.exists(bank.file_path):
-            os.remove(bank.file_path)
+        # Delete the file and its stored text if they exist
+        for path in (bank.file_path, _bank_text_path(bank.file_path)):
+            if os.path.exists(path):
+                os.remove(path)
         
         # Delete all questions from this bank
+        delete_question_co_tags(Question.source_file == os.path.basename(bank.file_path))
         Question.query.filter_by(source_file=os.path.basename(bank.file_path)).delete()
-        
+        bump_question_pool_version(bank.scheme_id, bank.subject_id)
+
+        # Ingest jobs keep their history but no longer point at the bank
+        IngestJob.query.filter_by(bank_id=bank.id).update({'bank_id': None}, synchronize_session=False)
+
         # Delete the bank record
         db.session.delete(bank)
         db.session.commit()
@@ -874,8 +1995,35 @@ def get_module_note_file(mid: int):
     download = request.args.get('download', default=0, type=int)
     return send_file(m.file_path, mimetype='application/pdf', as_attachment=bool(download), download_name=m.file_name)
 
+# Listings select plain columns, so rows are never hydrated into ORM objects
+_QUESTION_LIST_COLUMNS = (
+    Question.id, Question.text, Question.marks, Question.co_tags, Question.rbt_level, Question.subparts,
+    Question.module, Question.status, Question.parse_confidence, Question.created_at, Question.updated_at,
+)
+
+def _question_list_item(q):
+    return {
+        'id': q.id,
+        'text': q.text,
+        'marks': q.marks,
+        'co_tags': q.co_tags,
+        'rbt_level': q.rbt_level,
+        'subparts': q.subparts,
+        'module': q.module,
+        'status': q.status.value,
+        'parse_confidence': q.parse_confidence,
+        'created_at': q.created_at.isoformat() if q.created_at else None,
+        'updated_at': q.updated_at.isoformat() if q.updated_at else None
+    }
+
 @app.route('/api/questions', methods=['GET'])
 def get_questions():
+    """List questions in id order.
+
+    `after_id` and `limit` page through the listing by key (the next cursor is returned in
+    the X-Next-After-Id header while rows remain), and `format=ndjson` streams one question
+    per line from a server-side cursor. Without either, every matching question is returned.
+    """
     scheme_id = request.args.get('scheme_id', type=int)
     subject_id = request.args.get('subject_id', type=int)
     status = request.args.get('status')
@@ -883,8 +2031,15 @@ def get_questions():
     co = request.args.get('co')
     module = request.args.get('module', type=int)
     modules = request.args.getlist('modules[]', type=int)
-
-    q = Question.query
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    stream = request.args.get('format') == 'ndjson'
+    if limit is not None and limit < 1:
+        return jsonify({"errors": ["limit must be a positive integer"]}), 400
+    if limit is not None:
+        limit = min(limit, app.config["QUESTIONS_PAGE_MAX_LIMIT"])
+
+    q = db.select(*_QUESTION_LIST_COLUMNS)
     if scheme_id:
         q = q.filter_by(scheme_id=scheme_id)
     if subject_id:
@@ -894,26 +2049,97 @@ def get_questions():
     if rbt:
         q = q.filter(Question.rbt_level == rbt)
     if co:
-        q = q.filter(Question.co_tags.contains([co]))
+        # A per-row probe keeps the id order of the scope index, so pages need no sort
+        q = q.filter(db.exists().where(QuestionCoTag.question_id == Question.id, QuestionCoTag.co == co))
     if module:
         q = q.filter_by(module=module)
     elif modules:
         q = q.filter(Question.module.in_(modules))
-
-    questions = q.order_by(Question.id).all()
-    return jsonify([{
-        'id': q.id,
-        'text': q.text,
-        'marks': q.marks,
-        'co_tags': q.co_tags,
-        'rbt_level': q.rbt_level,
-        'subparts': q.subparts,
-        'module': q.module,
-        'status': q.status.value,
-        'parse_confidence': q.parse_confidence,
-        'created_at': q.created_at.isoformat() if q.created_at else None,
-        'updated_at': q.updated_at.isoformat() if q.updated_at else None
-    } for q in questions])
+    if after_id is not None:
+        q = q.filter(Question.id > after_id)
+    q = q.order_by(Question.id)
+
+    if stream:
+        if limit is not None:
+            q = q.limit(limit)
+        def generate():
+            result = db.session.execute(q.execution_options(yield_per=app.config["QUESTIONS_STREAM_BATCH"]))
+            for row in result:
+                yield json.dumps(_question_list_item(row)) + "\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    if limit is None:
+        return jsonify([_question_list_item(row) for row in db.session.execute(q)])
+    # One extra row tells whether another page follows
+    rows = db.session.execute(q.limit(limit + 1)).all()
+    resp = jsonify([_question_list_item(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        resp.headers['X-Next-After-Id'] = str(rows[limit - 1].id)
+    return resp
+
+_questions_fts = db.table('questions_fts', db.column('rowid'))
+
+def question_search_available():
+    with db.engine.connect() as conn:
+        return conn.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'")).first() is not None
+
+def _fts_match_query(s):
+    """FTS5 query for free text: every word must match, the last one as a prefix (search as you type)."""
+    words = re.findall(r"\w+", s or '')
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+@app.route('/api/questions/search', methods=['GET'])
+def search_questions():
+    """Full-text search over question and subpart text, best matches first.
+
+    `q` is free text; `scheme_id`, `subject_id`, `module` and `status` filter, and
+    `offset` / `limit` page through the ranking (X-Next-Offset is set while more remain).
+    Each result's `snippet` is unescaped plain text with matches wrapped in <mark>...</mark>,
+    since brackets already appear in bank text as tags like [10] and [CO1].
+    """
+    match = _fts_match_query(request.args.get('q'))
+    if match is None:
+        return jsonify({"errors": ["q must contain at least one word"]}), 400
+    limit = request.args.get('limit', 20, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    if limit < 1 or offset < 0:
+        return jsonify({"errors": ["limit must be positive and offset non-negative"]}), 400
+    limit = min(limit, app.config["QUESTIONS_PAGE_MAX_LIMIT"])
+    status = request.args.get('status')
+    if status and status not in QuestionStatus.__members__:
+        return jsonify({"errors": [f"Unknown status {status}"]}), 400
+    if not DB_URL.startswith('sqlite') or not question_search_available():
+        return jsonify({"errors": ["Full-text search is not available (needs SQLite with FTS5)"]}), 501
+
+    fts = db.literal_column('questions_fts')
+    # Matches in the question text weigh twice as much as matches in subparts
+    score = db.func.bm25(fts, 2.0, 1.0).label('score')
+    snippet = db.func.snippet(fts, -1, '<mark>', '</mark>', '...', 12).label('snippet')
+    q = (
+        db.select(*_QUESTION_LIST_COLUMNS, snippet, score)
+        .select_from(_questions_fts)
+        .join(Question, Question.id == _questions_fts.c.rowid)
+        .where(db.text("questions_fts MATCH :match").bindparams(match=match))
+    )
+    for name in ('scheme_id', 'subject_id', 'module'):
+        value = request.args.get(name, type=int)
+        if value:
+            q = q.where(getattr(Question, name) == value)
+    if status:
+        q = q.where(Question.status == QuestionStatus[status])
+    rows = db.session.execute(q.order_by(score).limit(limit + 1).offset(offset)).all()
+    resp = jsonify([
+        dict(_question_list_item(row), snippet=row.snippet, score=round(-row.score, 4))
+        for row in rows[:limit]
+    ])
+    if len(rows) > limit:
+        resp.headers['X-Next-Offset'] = str(offset + limit)
+    return resp
 
 @app.route('/api/questions/<int:qid>', methods=['PATCH'])
 def update_question(qid):
@@ -922,14 +2148,129 @@ def update_question(qid):
     for field in ["q_type","text","marks","co_tags","rbt_level","subparts","answer","tags"]:
         if field in data:
             setattr(q, field, data[field])
+    if 'text' in data:
+        q.text_fingerprint = question_fingerprint(q.text)
     if 'status' in data:
         try:
             q.status = QuestionStatus(data['status'])
         except Exception:
             pass
+    if 'co_tags' in data:
+        db.session.flush()
+        sync_question_co_tags(Question.id == q.id)
+    bump_question_pool_version(q.scheme_id, q.subject_id)
     db.session.commit()
     return jsonify({"ok": True})
 
+_BULK_UPDATE_FIELDS = ('status', 'module', 'marks', 'rbt_level', 'co_tags')
+_BULK_FILTER_FIELDS = ('bank_id', 'scheme_id', 'subject_id', 'status', 'module', 'rbt', 'co')
+
+def _bulk_update_values(changes):
+    """Column values for a bulk update, or (None, errors)."""
+    errors = []
+    values = {}
+    for field, value in changes.items():
+        if field not in _BULK_UPDATE_FIELDS:
+            errors.append(f"{field} cannot be bulk updated (allowed: {', '.join(_BULK_UPDATE_FIELDS)})")
+        elif field == 'status':
+            try:
+                values['status'] = QuestionStatus(value)
+            except ValueError:
+                errors.append(f"Unknown status {value}")
+        elif field == 'module':
+            # Same range as the upload endpoints
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= 5):
+                errors.append("module must be between 1 and 5 or null")
+            values['module'] = value
+        elif field == 'marks':
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                errors.append("marks must be an integer or null")
+            values['marks'] = value
+        elif field == 'rbt_level':
+            if value is not None and value not in ('L1', 'L2', 'L3', 'L4', 'L5', 'L6'):
+                errors.append("rbt_level must be one of L1-L6 or null")
+            values['rbt_level'] = value
+        else:
+            if not isinstance(value, list) or not all(isinstance(co, str) for co in value):
+                errors.append("co_tags must be a list of strings")
+            values['co_tags'] = value
+    return (None, errors) if errors else (values, [])
+
+def _bulk_update_criteria(data):
+    """WHERE clauses selecting the questions of a bulk update, or (None, errors)."""
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return None, ["ids must be a non-empty list of question ids"]
+        return [Question.id.in_(ids)], []
+    flt = data.get('filter')
+    if not isinstance(flt, dict) or not flt:
+        return None, ["Either ids or a non-empty filter is required"]
+    unknown = [k for k in flt if k not in _BULK_FILTER_FIELDS]
+    if unknown:
+        return None, [f"Unknown filter {k} (allowed: {', '.join(_BULK_FILTER_FIELDS)})" for k in unknown]
+    criteria = []
+    if 'bank_id' in flt:
+        bank = db.session.get(QuestionBank, flt['bank_id'])
+        if bank is None:
+            return None, [f"Question bank {flt['bank_id']} not found"]
+        criteria += [Question.source_file == os.path.basename(bank.file_path),
+                     Question.scheme_id == bank.scheme_id, Question.subject_id == bank.subject_id]
+    if 'status' in flt:
+        if flt['status'] not in QuestionStatus.__members__:
+            return None, [f"Unknown status {flt['status']}"]
+        criteria.append(Question.status == QuestionStatus[flt['status']])
+    for field, column in (('scheme_id', Question.scheme_id), ('subject_id', Question.subject_id),
+                          ('module', Question.module), ('rbt', Question.rbt_level)):
+        if field in flt:
+            criteria.append(column == flt[field])
+    if 'co' in flt:
+        criteria.append(Question.id.in_(db.select(QuestionCoTag.question_id).where(QuestionCoTag.co == flt['co'])))
+    return criteria, []
+
+@app.route('/api/questions/bulk-update', methods=['POST'])
+def bulk_update_questions():
+    """Apply the same changes to many questions in one transaction.
+
+    Questions are chosen by `ids` or by a `filter` (e.g. {"bank_id": 3, "status": "DRAFT"});
+    `set` holds the new status, module, marks, rbt_level and/or co_tags.
+    """
+    data = request.json or {}
+    criteria, errors = _bulk_update_criteria(data)
+    if criteria is None:
+        return jsonify({"errors": errors}), 400
+    changes = data.get('set')
+    if not isinstance(changes, dict) or not changes:
+        return jsonify({"errors": ["set must name at least one field to change"]}), 400
+    values, errors = _bulk_update_values(changes)
+    if values is None:
+        return jsonify({"errors": errors}), 400
+    try:
+        # Resolve the selection once: a `co` filter or a status filter stops matching as soon
+        # as the tags or status below are rewritten.
+        pools = db.session.execute(db.select(Question.scheme_id, Question.subject_id).where(*criteria).distinct()).all()
+        ids = db.session.execute(db.select(Question.id).where(*criteria)).scalars().all()
+        updated = 0
+        batch_size = app.config['INGEST_BATCH_SIZE']
+        for start in range(0, len(ids), batch_size):
+            selected = Question.id.in_(ids[start:start + batch_size])
+            if 'co_tags' in values:
+                delete_question_co_tags(selected)
+                for co in {co for co in values['co_tags'] if co}:
+                    db.session.execute(db.insert(QuestionCoTag.__table__).from_select(
+                        ['question_id', 'co'], db.select(Question.id, db.literal(co)).where(selected)))
+            updated += db.session.execute(
+                db.update(Question).where(selected).values(**values, updated_at=datetime.utcnow()),
+                execution_options={'synchronize_session': False},
+            ).rowcount
+        for scheme_id, subject_id in pools:
+            bump_question_pool_version(scheme_id, subject_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"errors": [f"Bulk update failed: {str(e)}"]}), 500
+    return jsonify({"updated": updated, "errors": []})
+
 @app.route('/api/paper-drafts/<int:draft_id>/export', methods=['POST'])
 def export_paper(draft_id):
     draft = PaperDraft.query.get_or_404(draft_id)
@@ -1072,109 +2413,367 @@ def export_paper(draft_id):
         f.write(''.join(html_parts))
     return send_file(path, as_attachment=True, download_name=f"paper_{draft_id}.html")
 
-@app.route('/api/generate-paper', methods=['POST'])
-def generate_paper():
-    data = request.json or {}
-    scheme_id = data.get('scheme_id')
-    subject_id = data.get('subject_id')
-    config = data
-    # Build draft rows and try to auto-fill from bank
+# -------- Paper generation --------
+class CandidateIndex:
+    """Questions of one pool bucketed for pick_question.
+
+    Buckets keep questions in pool order and are keyed by (blocked, marks, rbt),
+    (blocked, rbt) and (blocked, co, rbt), where `blocked` marks questions used by
+    recent drafts. Chosen questions are skipped lazily by advancing each bucket's
+    head, so a lookup returns exactly what a front-to-back scan of the pool would.
+    `blocked` and `chosen` are (ids, fingerprints) pairs; `chosen` is read as it grows.
+    """
+    def __init__(self, questions, blocked, chosen):
+        blocked_ids, blocked_texts = blocked
+        self._buckets = {}
+        self._heads = {}
+        self._chosen_ids, self._chosen_texts = chosen
+        self.levels = set()
+        self.scanned = 0  # bucket entries inspected, reported by generation profiling
+        for pos, q in enumerate(questions):
+            b = question_matches(q, blocked_ids, blocked_texts)
+            self.levels.add(q.rbt_level)
+            self._add(('mr', b, q.marks, q.rbt_level), pos, q)
+            self._add(('r', b, q.rbt_level), pos, q)
+            for co in set(q.co_tags or []):
+                self._add(('cr', b, co, q.rbt_level), pos, q)
+
+    def _add(self, key, pos, q):
+        self._buckets.setdefault(key, []).append((pos, q))
+
+    def _head(self, key):
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return None
+        i = start = self._heads.get(key, 0)
+        while i < len(bucket) and question_matches(bucket[i][1], self._chosen_ids, self._chosen_texts):
+            i += 1
+        self._heads[key] = i
+        self.scanned += min(i + 1, len(bucket)) - start
+        return bucket[i] if i < len(bucket) else None
+
+    def first(self, keys):
+        """Earliest available question (in pool order) across the given bucket keys."""
+        best = None
+        for key in keys:
+            head = self._head(key)
+            if head is not None and (best is None or head[0] < best[0]):
+                best = head
+        return best[1] if best else None
+
+# Generation only reads these columns, so pools are cached as plain tuples instead of ORM rows
+PoolQuestion = namedtuple('PoolQuestion', 'id text marks co_tags rbt_level subparts module text_fingerprint')
+_pool_cache = OrderedDict()  # (scheme_id, subject_id) -> {version, pool (tuple of PoolQuestion), buckets}
+_pool_cache_lock = threading.Lock()
+
+def question_pool_version(scheme_id, subject_id):
+    row = db.session.get(QuestionPoolVersion, (scheme_id, subject_id))
+    return row.version if row else 0
+
+def bump_question_pool_version(scheme_id, subject_id):
+    """Invalidate cached pools of a subject; call inside the transaction that changes its questions."""
+    table = QuestionPoolVersion.__table__
+    updated = db.session.execute(
+        db.update(table)
+        .where(table.c.scheme_id == scheme_id, table.c.subject_id == subject_id)
+        .values(version=table.c.version + 1)
+    ).rowcount
+    if not updated:
+        db.session.execute(db.insert(table).values(scheme_id=scheme_id, subject_id=subject_id, version=1))
+
+def _query_question_pool(scheme_id, subject_id):
+    rows = db.session.query(
+        Question.id, Question.text, Question.marks, Question.co_tags, Question.rbt_level,
+        Question.subparts, Question.module, Question.text_fingerprint
+    ).filter_by(scheme_id=scheme_id, subject_id=subject_id).order_by(Question.status.desc(), Question.created_at.desc())
+    return tuple(PoolQuestion(*row) for row in rows)
+
+def _pool_cache_entry(scheme_id, subject_id):
+    key = (scheme_id, subject_id)
+    version = question_pool_version(scheme_id, subject_id)
+    with _pool_cache_lock:
+        entry = _pool_cache.get(key)
+        if entry is not None and entry['version'] == version:
+            _pool_cache.move_to_end(key)
+            return entry
+    entry = {'version': version, 'pool': _query_question_pool(scheme_id, subject_id), 'buckets': None}
+    with _pool_cache_lock:
+        _pool_cache[key] = entry
+        _pool_cache.move_to_end(key)
+        while len(_pool_cache) > app.config["POOL_CACHE_MAX_SUBJECTS"]:
+            _pool_cache.popitem(last=False)
+    return entry
+
+def load_question_pool(scheme_id, subject_id):
+    """Questions of a subject, APPROVED before DRAFT and newest first (generation shuffles them).
+
+    Served from a per-process cache while the subject's pool version is unchanged, so
+    repeated generations only read question_pool_versions.
+    """
+    return list(_pool_cache_entry(scheme_id, subject_id)['pool'])
+
+POOL_ANY = '*'
+
+def question_pool_buckets(scheme_id, subject_id):
+    """Cached pool questions bucketed by (marks, module, rbt_level), with POOL_ANY as a wildcard.
+
+    Module 0 (unassigned) questions are also filed under every module. Buckets keep pool
+    order and are built once per pool version. Returns (buckets, questions by id).
+    """
+    entry = _pool_cache_entry(scheme_id, subject_id)
+    if entry['buckets'] is None:
+        entry['by_id'] = {q.id: q for q in entry['pool']}
+        buckets = {}
+        modules = {q.module or 0 for q in entry['pool']}
+        for q in entry['pool']:
+            own = q.module or 0
+            module_keys = set(modules) if own == 0 else {own}
+            module_keys.add(POOL_ANY)
+            for mk in (q.marks, POOL_ANY):
+                for md in module_keys:
+                    for lvl in (q.rbt_level, POOL_ANY):
+                        buckets.setdefault((mk, md, lvl), []).append(q)
+        entry['buckets'] = buckets
+    return entry['buckets'], entry['by_id']
+
+def _draft_usage_rows(draft, used_at):
+    # Rows come from clients as-is, so anything malformed is skipped rather than failing the save
+    for r in (draft.rows or []):
+        if not isinstance(r, dict) or r.get('type') != 'question' or not isinstance(r.get('parts'), list):
+            continue
+        for p in r['parts']:
+            if not isinstance(p, dict):
+                continue
+            qid = p.get('source_qid')
+            if not isinstance(qid, int) or isinstance(qid, bool):
+                qid = None
+            txt = p.get('text') if isinstance(p.get('text'), str) else ''
+            if qid or txt:
+                yield {
+                    'scheme_id': draft.scheme_id,
+                    'subject_id': draft.subject_id,
+                    'question_id': qid,
+                    'text_fingerprint': question_fingerprint(txt) if txt else None,
+                    'draft_id': draft.id,
+                    'used_at': used_at,
+                }
+
+def record_question_usage(draft, used_at=None):
+    """Replace the ledger rows of a (flushed) draft with its current parts; the caller commits."""
+    rows = list(_draft_usage_rows(draft, used_at or datetime.utcnow()))
+    db.session.execute(db.delete(QuestionUsage.__table__).where(QuestionUsage.__table__.c.draft_id == draft.id))
+    if rows:
+        db.session.execute(db.insert(QuestionUsage.__table__), rows)
+
+def lookback_errors(data):
+    """Errors for request lookback_drafts / lookback_days that are not null or a non-negative integer."""
+    errors = []
+    for field in ('lookback_drafts', 'lookback_days'):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            errors.append(f"{field} must be a non-negative integer or null")
+    return errors
+
+def recent_usage_blocks(scheme_id, subject_id, drafts=None, days=None, exclude_key=None):
+    """Question ids and text fingerprints used recently in a subject's drafts.
+
+    The window is the last `days` days when given (or USAGE_LOOKBACK_DAYS is set),
+    otherwise the last `drafts` drafts (USAGE_LOOKBACK_DRAFTS by default). Drafts whose
+    generation_key is `exclude_key` are left out, so a seeded request is not blocked by
+    its own earlier results.
+    """
+    if days is None:
+        days = app.config["USAGE_LOOKBACK_DAYS"]
+    if drafts is None:
+        drafts = app.config["USAGE_LOOKBACK_DRAFTS"]
+    usage = QuestionUsage.__table__
+    scope = [usage.c.subject_id == subject_id, usage.c.scheme_id == scheme_id]
+    if exclude_key is not None:
+        scope.append(usage.c.draft_id.not_in(db.select(PaperDraft.id).where(PaperDraft.generation_key == exclude_key)))
+    stmt = db.select(usage.c.question_id, usage.c.text_fingerprint).where(*scope)
+    if days:
+        stmt = stmt.where(usage.c.used_at >= datetime.utcnow() - timedelta(days=days))
+    else:
+        recent = db.select(usage.c.draft_id).where(*scope).group_by(usage.c.draft_id).order_by(db.func.max(usage.c.used_at).desc(), usage.c.draft_id.desc()).limit(drafts)
+        stmt = stmt.where(usage.c.draft_id.in_(recent))
+    blocked_ids = set()
+    blocked_texts = set()
+    for qid, fp in db.session.execute(stmt):
+        if qid:
+            blocked_ids.add(qid)
+        if fp:
+            blocked_texts.add(fp)
+    return blocked_ids, blocked_texts
+
+def backfill_question_usage(conn):
+    """Build ledger rows for drafts saved before the ledger existed (migration 7)."""
+    drafts = PaperDraft.__table__
+    have = db.select(QuestionUsage.__table__.c.draft_id)
+    count = 0
+    for draft in conn.execute(db.select(drafts).where(drafts.c.id.not_in(have)).order_by(drafts.c.id)).all():
+        try:
+            rows = list(_draft_usage_rows(draft, draft.created_at or datetime.utcnow()))
+        except Exception:
+            continue  # malformed rows JSON; the old scan skipped these drafts too
+        if rows:
+            conn.execute(db.insert(QuestionUsage.__table__), rows)
+        count += 1
+    return count
+
+class GenerationProfile:
+    """Wall time per phase and work counters for one paper generation."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = OrderedDict()
+        self.counters = Counter()
+        self.total = None
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        return self
+
+    def to_dict(self):
+        return {
+            "total_ms": round((self.total or 0) * 1000, 3),
+            "phases_ms": {name: round(sec * 1000, 3) for name, sec in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def server_timing(self):
+        metrics = [f"{name};dur={sec * 1000:.3f}" for name, sec in self.phases.items()]
+        metrics.append(f"total;dur={(self.total or 0) * 1000:.3f}")
+        metrics.extend(f'{name};desc="{value}"' for name, value in self.counters.items())
+        return ", ".join(metrics)
+
+_generation_stats = deque()
+_generation_stats_lock = threading.Lock()
+
+def generation_profile():
+    """The profile of the generation running in this request, or None when it is not profiled."""
+    return g.get('generation_profile') if has_request_context() else None
+
+@contextmanager
+def profile_phase(name):
+    """Time a block into the active profile; repeated phases accumulate."""
+    profile = generation_profile()
+    if profile is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] = profile.phases.get(name, 0.0) + time.perf_counter() - t0
+
+def profile_count(name, n=1):
+    profile = generation_profile()
+    if profile is not None:
+        profile.counters[name] += n
+
+def profile_merge(timings, counters):
+    """Add phase seconds and counters an engine tallied locally (its hot loops skip the lookups)."""
+    profile = generation_profile()
+    if profile is not None:
+        for name, sec in timings.items():
+            profile.phases[name] = profile.phases.get(name, 0.0) + sec
+        profile.counters.update(counters)
+
+def record_generation_profile(profile):
+    with _generation_stats_lock:
+        _generation_stats.append(profile.to_dict())
+        while len(_generation_stats) > app.config["GENERATION_STATS_WINDOW"]:
+            _generation_stats.popleft()
+
+with app.app_context():
+    # Statements issued while a profiled generation runs are counted against it
+    from sqlalchemy import event
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def _count_profiled_query(conn, cursor, statement, parameters, context, executemany):
+        profile_count('db_queries')
+
+def allocate_by_percent(percents, total):
+    """Split `total` parts by percentage (largest remainder first); {} when no plan applies."""
+    counts = {}
+    if total <= 0 or not percents:
+        return counts
+    assigned = 0
+    remainders = []
+    for key, pct in percents.items():
+        exact = pct * total / 100.0
+        cnt = int(exact)
+        counts[key] = cnt
+        assigned += cnt
+        remainders.append((key, exact - cnt))
+    # Distribute leftover by highest remainders
+    leftover = max(0, total - assigned)
+    remainders.sort(key=lambda x: x[1], reverse=True)
+    i = 0
+    while leftover > 0 and i < len(remainders):
+        key = remainders[i][0]
+        counts[key] = counts.get(key, 0) + 1
+        leftover -= 1
+        i = (i + 1) % max(1, len(remainders))
+    return counts
+
+def greedy_paper_rows(config, all_q, module_groups, blocked_ids, blocked_texts):
+    """Fill question rows part by part with pick_question and its relaxation ladder."""
     rows = []
-    # Load pool from DB: prefer APPROVED, then DRAFT if insufficient, then randomize order to avoid repetition
-    all_q = Question.query.filter_by(scheme_id=scheme_id, subject_id=subject_id).order_by(Question.status.desc(), Question.created_at.desc()).all()
-    import random
-    random.shuffle(all_q)
-    # Group by module for percentage-based selection
-    module_groups = {}
-    for q in all_q:
-        m = q.module or 0
-        module_groups.setdefault(m, []).append(q)
-    # Shuffle each module pool to avoid repetition patterns
-    for m in list(module_groups.keys()):
-        random.shuffle(module_groups[m])
+    # Work tallies and phase seconds for generation profiling
+    stats = Counter()
+    timings = Counter()
     # Selection helpers
     # Track what we are choosing in this generation separately from recently used
+    # Never repeat a question (or the same text, by fingerprint) within this paper
     chosen_ids = set()
     chosen_texts = set()
-    blocked_ids = set()   # from recent drafts
-    blocked_texts = set() # from recent drafts (normalized)
-    def norm_text(s):
-        return (clean_question_text(s or '') or '').lower().strip()
+    # Candidate indexes are built once the recently used questions are known
+    all_index = None
+    module_indexes = {}
     def pick_question(target_marks=None, prefer_rbt=None, prefer_co=None, prefer_module=None, ignore_rbt_allocation=False, ignore_module_allocation=False, allow_reuse=False):
-        # 1) exact marks match with optional module/RBT constraints and not used
+        stats['pick_question_calls'] += 1
+        # Each search pool is a sequence of indexes scanned in order (preferred module, then unassigned)
         search_pools = []
         if prefer_module and not ignore_module_allocation:
             # Combine preferred module pool with unassigned (module 0) so that unassigned can satisfy any slot
-            pool_pref = list(module_groups.get(prefer_module, []))
-            pool_unassigned = list(module_groups.get(0, []))
-            search_pools.append(pool_pref + pool_unassigned)
+            search_pools.append([module_indexes[m] for m in (prefer_module, 0) if m in module_indexes])
         # fallback pool (any module) only when module distribution is not enforced or ignoring module allocation
-        try:
-            module_active = bool(module_percents)
-        except Exception:
-            module_active = False
+        module_active = bool(module_percents)
         if ignore_module_allocation or not module_active or not prefer_module:
-            search_pools.append(all_q)
-        for pool in search_pools:
-            for q in pool:
-                # Always avoid repeating the same question within this paper
-                if q.id in chosen_ids:
-                    continue
-                # If not allowing reuse, also avoid items blocked by recent drafts
-                if not allow_reuse and q.id in blocked_ids:
-                    continue
-                if target_marks is not None and q.marks == target_marks and (norm_text(q.text) not in chosen_texts) and (allow_reuse or norm_text(q.text) not in blocked_texts):
-                    # If RBT distribution is active, ensure either preferred RBT matches or at least the level has remaining capacity
-                    if prefer_rbt is not None:
-                        if q.rbt_level == prefer_rbt:
-                            return q
-                    else:
-                        # No specific preference; enforce availability if configured
-                        try:
-                            rbt_active = any(rbt_percents.values())
-                        except Exception:
-                            rbt_active = False
-                        if ignore_rbt_allocation or (not rbt_active or rbt_allowed(q.rbt_level)):
-                            return q
-        # 2) any not used with preferred rbt/co
-        for pool in search_pools:
-            for q in pool:
-                if q.id in chosen_ids:
-                    continue
-                if not allow_reuse and q.id in blocked_ids:
-                    continue
-                if prefer_rbt and q.rbt_level == prefer_rbt and (norm_text(q.text) not in chosen_texts) and (allow_reuse or norm_text(q.text) not in blocked_texts):
-                    # also ensure availability if RBT plan active
-                    try:
-                        if ignore_rbt_allocation or not any(rbt_percents.values()) or rbt_allowed(q.rbt_level):
-                            return q
-                    except Exception:
-                        return q
-                if prefer_co and prefer_co in (q.co_tags or []) and (norm_text(q.text) not in chosen_texts) and (allow_reuse or norm_text(q.text) not in blocked_texts):
-                    # if RBT plan is active, still ensure availability for the question's level
-                    try:
-                        if ignore_rbt_allocation or not any(rbt_percents.values()) or rbt_allowed(q.rbt_level):
-                            return q
-                    except Exception:
-                        return q
-        # 3) any not used
+            search_pools.append([all_index])
+        blocked_flags = (False, True) if allow_reuse else (False,)
+        rbt_active = any(rbt_percents.values())
+        def level_ok(lvl):
+            return ignore_rbt_allocation or not rbt_active or rbt_allowed(lvl)
+        def first(pool, keys_for):
+            for index in pool:
+                q = index.first([key for b in blocked_flags for key in keys_for(index, b)])
+                if q is not None:
+                    return q
+            return None
+        # 1) exact marks match; the preferred RBT level, or any level with remaining capacity
+        if target_marks is not None:
+            if prefer_rbt is not None:
+                keys_for = lambda index, b: [('mr', b, target_marks, prefer_rbt)]
+            else:
+                keys_for = lambda index, b: [('mr', b, target_marks, lvl) for lvl in index.levels if level_ok(lvl)]
+            for pool in search_pools:
+                q = first(pool, keys_for)
+                if q is not None:
+                    return q
+        # 2) any marks with the preferred rbt/co, still respecting RBT availability
+        def pass2_keys(index, b):
+            keys = []
+            if prefer_rbt and level_ok(prefer_rbt):
+                keys.append(('r', b, prefer_rbt))
+            if prefer_co:
+                keys.extend(('cr', b, prefer_co, lvl) for lvl in index.levels if level_ok(lvl))
+            return keys
         for pool in search_pools:
-            for q in pool:
-                # final fallback respects non-repetition within this paper
-                if q.id in chosen_ids:
-                    continue
-                if not allow_reuse and q.id in blocked_ids:
-                    continue
-                if norm_text(q.text) in chosen_texts:
-                    continue
-                if not allow_reuse and norm_text(q.text) in blocked_texts:
-                    continue
-                    # final fallback respects RBT availability if configured
-                    try:
-                        if ignore_rbt_allocation or not any(rbt_percents.values()) or rbt_allowed(q.rbt_level):
-                            return q
-                    except Exception:
-                        return q
+            q = first(pool, pass2_keys)
+            if q is not None:
+                return q
         return None
 
     # Prepare module distribution plan based on percentages (over total parts)
@@ -1185,25 +2784,7 @@ def generate_paper():
     for qcfg in config.get('questions', []):
         total_parts += len(qcfg.get('parts', ['a','b']))
     # Build target counts per module
-    remaining_counts = {}
-    if total_parts > 0 and module_percents:
-        assigned = 0
-        remainders = []
-        for m, pct in module_percents.items():
-            exact = pct * total_parts / 100.0
-            cnt = int(exact)
-            remaining_counts[m] = cnt
-            assigned += cnt
-            remainders.append((m, exact - cnt))
-        # Distribute leftover by highest remainders
-        leftover = max(0, total_parts - assigned)
-        remainders.sort(key=lambda x: x[1], reverse=True)
-        i = 0
-        while leftover > 0 and i < len(remainders):
-            m = remainders[i][0]
-            remaining_counts[m] = remaining_counts.get(m, 0) + 1
-            leftover -= 1
-            i = (i + 1) % max(1, len(remainders))
+    remaining_counts = allocate_by_percent(module_percents, total_parts)
     # Helper to check if a module is currently allowed (percent > 0)
     def module_allowed(mod):
         if not module_percents:
@@ -1222,24 +2803,7 @@ def generate_paper():
     # Normalize keys to canonical L1-L6 strings
     rbt_keys = ['L1','L2','L3','L4','L5','L6']
     rbt_percents = {k: int(rbt_percents.get(k, 0)) for k in rbt_keys}
-    remaining_rbt = {}
-    if rbt_enabled and total_parts > 0 and any(rbt_percents.values()):
-        assigned = 0
-        remainders = []
-        for lvl, pct in rbt_percents.items():
-            exact = pct * total_parts / 100.0
-            cnt = int(exact)
-            remaining_rbt[lvl] = cnt
-            assigned += cnt
-            remainders.append((lvl, exact - cnt))
-        leftover = max(0, total_parts - assigned)
-        remainders.sort(key=lambda x: x[1], reverse=True)
-        i = 0
-        while leftover > 0 and i < len(remainders):
-            lvl = remainders[i][0]
-            remaining_rbt[lvl] = remaining_rbt.get(lvl, 0) + 1
-            leftover -= 1
-            i = (i + 1) % max(1, len(remainders))
+    remaining_rbt = allocate_by_percent(rbt_percents, total_parts) if rbt_enabled and any(rbt_percents.values()) else {}
     def rbt_allowed(lvl):
         if not rbt_enabled or not any(rbt_percents.values()):
             return True
@@ -1249,21 +2813,15 @@ def generate_paper():
         rbt_plan.extend([lvl] * cnt)
     rbt_idx = 0
 
-    # Avoid reusing questions from recent drafts of same subject/scheme
-    recent = PaperDraft.query.filter_by(scheme_id=scheme_id, subject_id=subject_id).order_by(PaperDraft.created_at.desc()).limit(5).all()
-    for d in recent:
-        try:
-            for r in (d.rows or []):
-                if r.get('type') == 'question':
-                    for p in r.get('parts', []):
-                        sid = p.get('source_qid')
-                        if sid:
-                            blocked_ids.add(sid)
-                        txt = p.get('text') or ''
-                        if txt:
-                            blocked_texts.add(norm_text(txt))
-        except Exception:
-            pass
+    t0 = time.perf_counter()
+    blocked = (blocked_ids, blocked_texts)
+    chosen = (chosen_ids, chosen_texts)
+    all_index = CandidateIndex(all_q, blocked, chosen)
+    for m, pool in module_groups.items():
+        module_indexes[m] = CandidateIndex(pool, blocked, chosen)
+    timings['index_build'] += time.perf_counter() - t0
+    # Only questions with subparts can fill a whole row
+    subpart_q = [q for q in all_q if q.subparts]
 
     for qcfg in config.get('questions', []):
         qno = qcfg.get('qno')
@@ -1272,19 +2830,18 @@ def generate_paper():
         row = {"type":"question", "qno": qno, "parts": []}
         # Try to fill from questions with subparts first
         # If a question has enough subparts, map them to parts
+        t0 = time.perf_counter()
         chosen = None
         # Pass 1: prefer subparts question that hasn't been chosen in this draft and not recently used
-        for q in all_q:
-            # never reuse the same question within the same generated paper
-            if q.id in chosen_ids:
-                continue
-            # avoid same normalized text selected already
-            if norm_text(q.text) in chosen_texts:
+        for q in subpart_q:
+            stats['candidates_scanned'] += 1
+            # never reuse the same question (or same normalized text) within the same generated paper
+            if question_matches(q, chosen_ids, chosen_texts):
                 continue
             # avoid recently used pool on first pass
-            if (q.id in blocked_ids or norm_text(q.text) in blocked_texts):
+            if question_matches(q, blocked_ids, blocked_texts):
                 continue
-            if q.subparts and len(q.subparts) >= len(parts):
+            if len(q.subparts) >= len(parts):
                 # Enforce module percentages: require remaining capacity for this module to cover all parts
                 qm = q.module or 0
                 qlvl = q.rbt_level
@@ -1294,12 +2851,11 @@ def generate_paper():
                     break
         # Pass 2: allow recently used if nothing found yet
         if chosen is None:
-            for q in all_q:
-                if q.id in chosen_ids:
-                    continue
-                if norm_text(q.text) in chosen_texts:
+            for q in subpart_q:
+                stats['candidates_scanned'] += 1
+                if question_matches(q, chosen_ids, chosen_texts):
                     continue
-                if q.subparts and len(q.subparts) >= len(parts):
+                if len(q.subparts) >= len(parts):
                     qm = q.module or 0
                     qlvl = q.rbt_level
                     rbt_ok = (not rbt_enabled or not any(rbt_percents.values())) or (qlvl in remaining_rbt and remaining_rbt.get(qlvl, 0) >= len(parts))
@@ -1308,7 +2864,7 @@ def generate_paper():
                         break
         if chosen is not None:
             chosen_ids.add(chosen.id)
-            chosen_texts.add(norm_text(chosen.text))
+            chosen_texts.add(pool_question_fingerprint(chosen))
             for idx, p in enumerate(parts):
                 sp = chosen.subparts[idx]
                 row["parts"].append({
@@ -1337,7 +2893,10 @@ def generate_paper():
                 if qlvl in remaining_rbt:
                     remaining_rbt[qlvl] = max(0, remaining_rbt[qlvl] - len(parts))
             rows.append(row)
+            timings['subpart_rows'] += time.perf_counter() - t0
             continue
+        t1 = time.perf_counter()
+        timings['subpart_rows'] += t1 - t0
         # Otherwise pick per-part
         for p in parts:
             target_mk = marks_map.get(p)
@@ -1379,6 +2938,8 @@ def generate_paper():
 
             # Progressive relaxation always: try to avoid blanks
             if q is None:
+                stats['relaxed_parts'] += 1
+                calls_before = stats['pick_question_calls']
                 # 1) keep module preference, ignore RBT allocation
                 if prefer_module is not None and module_allowed(prefer_module):
                     if prefer_rbt is not None:
@@ -1411,6 +2972,7 @@ def generate_paper():
                         q = pick_question(None, prefer_rbt=prefer_rbt, allow_reuse=True, ignore_module_allocation=True)
                     if q is None:
                         q = pick_question(None, allow_reuse=True, ignore_rbt_allocation=True, ignore_module_allocation=True)
+                stats['relaxation_steps'] += stats['pick_question_calls'] - calls_before
             if q is not None:
                 chosen_ids.add(q.id)
                 # decrement remaining for module if applicable
@@ -1433,7 +2995,7 @@ def generate_paper():
                         remaining_rbt[qlvl] -= 1
                 plan_idx += 1
                 rbt_idx += 1
-                chosen_texts.add(norm_text(q.text))
+                chosen_texts.add(pool_question_fingerprint(q))
                 row["parts"].append({
                     "label": p,
                     "text": clean_question_text(q.text),
@@ -1445,27 +3007,604 @@ def generate_paper():
             else:
                 row["parts"].append({"label": p, "text": "", "marks": target_mk, "co": [], "rbt": None})
         rows.append(row)
+        timings['part_picks'] += time.perf_counter() - t1
+    stats['candidates_scanned'] += all_index.scanned + sum(index.scanned for index in module_indexes.values())
+    profile_merge(timings, stats)
+    return rows
+
+def _cheapest_path(residual, cost, source):
+    """Bellman-Ford (queue based) parents of the cheapest residual paths from `source`."""
+    dist = {source: 0}
+    parent = {source: None}
+    queue = deque([source])
+    queued = {source}
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        for v, cap in residual[u].items():
+            d = dist[u] + cost.get((u, v), 0)
+            if cap > 0 and d < dist.get(v, float('inf')):
+                dist[v] = d
+                parent[v] = u
+                if v not in queued:
+                    queued.add(v)
+                    queue.append(v)
+    return parent
+
+def _max_flow(capacity, source, sink, cost=None):
+    """Edmonds-Karp max flow over {u: {v: cap}}; returns (value, {u: {v: flow}}).
+
+    With `cost` ({(u, v): c}, other edges free) each augmenting path is the cheapest
+    one instead (successive shortest paths), so the max flow found is also the cheapest.
+    """
+    residual = {u: dict(vs) for u, vs in capacity.items()}
+    for u, vs in capacity.items():
+        for v in vs:
+            residual.setdefault(v, {}).setdefault(u, 0)
+    if cost:
+        cost = {**cost, **{(v, u): -c for (u, v), c in cost.items()}}
+    value = 0
+    while True:
+        if cost:
+            parent = _cheapest_path(residual, cost, source)
+        else:
+            parent = {source: None}
+            queue = deque([source])
+            while queue and sink not in parent:
+                u = queue.popleft()
+                for v, cap in residual[u].items():
+                    if cap > 0 and v not in parent:
+                        parent[v] = u
+                        queue.append(v)
+        if sink not in parent:
+            break
+        path = []
+        v = sink
+        while parent[v] is not None:
+            path.append((parent[v], v))
+            v = parent[v]
+        push = min(residual[u][v] for u, v in path)
+        for u, v in path:
+            residual[u][v] -= push
+            residual[v][u] += push
+        value += push
+    flow = {}
+    for u, vs in capacity.items():
+        for v, cap in vs.items():
+            if cap - residual[u][v] > 0:
+                flow.setdefault(u, {})[v] = cap - residual[u][v]
+    return value, flow
+
+def assign_blueprint_slots(slot_marks, candidates, module_caps=None, rbt_caps=None, avoid=None):
+    """Pick one candidate per slot so marks match and module/RBT quotas are not exceeded.
+
+    `slot_marks` lists the marks wanted by each slot (None accepts any), `candidates` are
+    questions in pool order with distinct text, and a quota of None is not enforced.
+    Module 0 (unassigned) questions may count toward any module's quota. Candidates whose
+    id is in `avoid` cost one each, and the flows take as few of them as they can.
+
+    With one quota this is a single flow: marks classes -> (marks, key) groups -> quota.
+    Marks x module x RBT is not a network flow, so with both quotas the RBT levels are
+    placed by a second flow over the groups the first one chose; when that falls short,
+    a chosen group loses one unit of capacity and the first flow is re-run (a bounded
+    depth-first search over which group gives way). Returns
+    questions aligned with `slot_marks`, earliest in pool order first, or None when no
+    assignment was found.
+    """
+    n = len(slot_marks)
+    if n == 0:
+        return []
+    classes = Counter(slot_marks)
+    # The first flow enforces module quotas when given, otherwise RBT quotas
+    if module_caps is not None:
+        key_of, key_caps, wildcard = (lambda q: q.module or 0), module_caps, 0
+        level_caps = rbt_caps
+    else:
+        key_of, key_caps, wildcard = (lambda q: q.rbt_level), rbt_caps, object()
+        level_caps = None
+    position = {}
+    groups = {}  # (marks, key) -> {level: [questions in pool order]}
+    for pos, q in enumerate(candidates):
+        if q.marks not in classes and None not in classes:
+            continue
+        if module_caps is not None and (q.module or 0) != 0 and module_caps.get(q.module, 0) <= 0:
+            continue
+        if rbt_caps is not None and rbt_caps.get(q.rbt_level, 0) <= 0:
+            continue
+        position[q.id] = pos
+        lvl = q.rbt_level if level_caps is not None else None
+        groups.setdefault((q.marks, key_of(q)), {}).setdefault(lvl, []).append(q)
+    avoid = avoid or set()
+    # Per (group, level) the questions to avoid go last and are counted separately
+    fresh = {}
+    for grp, levels in groups.items():
+        for lvl, qs in levels.items():
+            qs.sort(key=lambda q: q.id in avoid)
+            fresh[grp, lvl] = sum(1 for q in qs if q.id not in avoid)
+    group_fresh = {grp: sum(fresh[grp, lvl] for lvl in levels) for grp, levels in groups.items()}
+    group_cap = {grp: sum(len(qs) for qs in levels.values()) for grp, levels in groups.items()}
+
+    def solve(group_cap):
+        profile_count('flow_solves')
+        # Flow 1: marks classes -> groups -> module (or RBT) quotas
+        cap = {'S': {('c', k): cnt for k, cnt in classes.items()}}
+        cost = {}
+        for k in classes:
+            cap[('c', k)] = {('g', grp): n for grp in groups if k is None or grp[0] == k}
+        for grp in groups:
+            # A group's avoided questions pass through their own, costly edge
+            f = min(group_cap[grp], group_fresh[grp])
+            cap[('g', grp)] = {('gf', grp): f, ('ga', grp): group_cap[grp] - f}
+            cap[('gf', grp)] = {('go', grp): f}
+            cap[('ga', grp)] = {('go', grp): group_cap[grp] - f}
+            cost[('g', grp), ('ga', grp)] = 1
+            if key_caps is None:
+                targets = ['*']
+            elif grp[1] == wildcard:
+                targets = [m for m, c in key_caps.items() if c > 0]
+            else:
+                targets = [grp[1]]
+            cap[('go', grp)] = {('m', m): n for m in targets}
+        if key_caps is None:
+            cap[('m', '*')] = {'T': n}
+        else:
+            for m, c in key_caps.items():
+                cap[('m', m)] = {'T': c}
+        value, flow = _max_flow(cap, 'S', 'T', cost if avoid else None)
+        if value < n:
+            return None, None
+        used = {grp: sum(flow.get(('g', grp), {}).values()) for grp in groups}
+
+        # Flow 2: chosen groups -> RBT levels (a single pass-through level when not enforced)
+        cap = {'S': {('g', grp): y for grp, y in used.items() if y}}
+        cost = {}
+        for grp, y in used.items():
+            if y:
+                cap[('g', grp)] = {}
+                for lvl, qs in groups[grp].items():
+                    f = fresh[grp, lvl]
+                    cap[('g', grp)][('lf', grp, lvl)] = f
+                    cap[('g', grp)][('la', grp, lvl)] = len(qs) - f
+                    cap[('lf', grp, lvl)] = {('l', lvl): f}
+                    cap[('la', grp, lvl)] = {('l', lvl): len(qs) - f}
+                    cost[('g', grp), ('la', grp, lvl)] = 1
+        for lvl in {lvl for levels in groups.values() for lvl in levels}:
+            cap[('l', lvl)] = {'T': n if level_caps is None else level_caps.get(lvl, 0)}
+        value, level_flow = _max_flow(cap, 'S', 'T', cost if avoid else None)
+        if value == sum(used.values()):
+            return (flow, level_flow), None
+        # Any chosen group may be the one crowding a level; try the groups left short first
+        short = [grp for grp, y in used.items() if y and sum(level_flow.get(('g', grp), {}).values()) < y]
+        rest = [grp for grp, y in used.items() if y and grp not in short]
+        return (flow, level_flow), [(grp, used[grp]) for grp in short + rest]
+
+    # Depth-first over which chosen group gives up a unit of capacity, within a budget
+    stack = [group_cap]
+    seen = set()
+    budget = 200
+    while stack and budget:
+        group_cap = stack.pop()
+        state = tuple(sorted(group_cap.items(), key=repr))
+        if state in seen:
+            continue
+        seen.add(state)
+        budget -= 1
+        flows, short = solve(group_cap)
+        if flows is None:
+            continue
+        if not short:
+            flow, level_flow = flows
+            break
+        for grp, y in reversed(short):
+            stack.append({**group_cap, grp: y - 1})
+    else:
+        return None
+
+    # Take the earliest questions of each (group, level), then hand them out per marks class
+    picked = {}
+    for grp in groups:
+        qs = []
+        for lvl, level_qs in groups[grp].items():
+            z = sum(level_flow.get(('g', grp), {}).get((kind, grp, lvl), 0) for kind in ('lf', 'la'))
+            qs.extend(level_qs[:z])
+        picked[grp] = deque(sorted(qs, key=lambda q: position[q.id]))
+    by_class = {}
+    for k in classes:
+        qs = []
+        for (_, grp), f in flow.get(('c', k), {}).items():
+            qs.extend(picked[grp].popleft() for _ in range(f))
+        by_class[k] = deque(sorted(qs, key=lambda q: position[q.id]))
+    return [by_class[k].popleft() for k in slot_marks]
+
+# Relaxation ladder for the solver: (constraint relaxed, keep module quotas, keep RBT quotas, allow recent).
+# Reusing questions from recent drafts is preferred over breaking the blueprint.
+_SOLVER_RELAXATIONS = [
+    (None, True, True, False),
+    ('recent_drafts', True, True, True),
+    ('rbt_percentages', True, False, True),
+    ('module_percentages', False, True, True),
+    ('module_percentages+rbt_percentages', False, False, True),
+]
+_SOLVER_RELAX_REASONS = {
+    'recent_drafts': "not enough questions outside recent drafts (or earlier sets) to meet the marks, module and RBT quotas",
+    'rbt_percentages': "the RBT quotas cannot be met together with the marks and module quotas",
+    'module_percentages': "the module quotas cannot be met together with the marks and RBT quotas",
+    'module_percentages+rbt_percentages': "the requested marks can only be met by ignoring module and RBT quotas",
+}
+
+def solve_paper_rows(config, all_q, blocked_ids, blocked_texts):
+    """Fill question rows by solving the module/RBT blueprint as a flow problem.
+
+    Rows are first filled whole from questions with enough subparts, as the greedy
+    engine does; the remaining parts become slots for assign_blueprint_slots. Returns
+    (rows, report), with rows None when no relaxation could fill every slot.
+    """
+    module_percents = config.get('module_percentages') or {}
+    module_percents = {int(k): int(module_percents[k]) for k in module_percents.keys() if str(k).isdigit()}
+    total_parts = sum(len(qcfg.get('parts', ['a','b'])) for qcfg in config.get('questions', []))
+    remaining_counts = allocate_by_percent(module_percents, total_parts)
+    rbt_enabled = bool(config.get('rbt_enabled', True))
+    rbt_percents = (config.get('rbt_percentages') or {}) if rbt_enabled else {}
+    rbt_percents = {k: int(rbt_percents.get(k, 0)) for k in ['L1','L2','L3','L4','L5','L6']}
+    rbt_active = rbt_enabled and any(rbt_percents.values())
+    remaining_rbt = allocate_by_percent(rbt_percents, total_parts) if rbt_active else {}
+
+    chosen_ids = set()
+    chosen_texts = set()
+    def fits_row(q, n):
+        rbt_ok = not rbt_active or remaining_rbt.get(q.rbt_level, 0) >= n
+        return (not module_percents or remaining_counts.get(q.module or 0, 0) >= n) and rbt_ok
+    # Work tallies and phase seconds for generation profiling
+    stats = Counter()
+    timings = Counter()
+    def first_subpart_question(n, allow_recent):
+        for q in subpart_q:
+            stats['candidates_scanned'] += 1
+            if question_matches(q, chosen_ids, chosen_texts):
+                continue
+            if (allow_recent or not question_matches(q, blocked_ids, blocked_texts)) and len(q.subparts) >= n and fits_row(q, n):
+                return q
+        return None
+
+    t0 = time.perf_counter()
+    rows = []
+    slots = []  # (row, part index, marks)
+    reused_rows = False
+    subpart_q = [q for q in all_q if q.subparts]
+    for qcfg in config.get('questions', []):
+        parts = qcfg.get('parts', ['a','b'])
+        marks_map = qcfg.get('marks', {})
+        row = {"type":"question", "qno": qcfg.get('qno'), "parts": []}
+        rows.append(row)
+        chosen = first_subpart_question(len(parts), False)
+        if chosen is None:
+            chosen = first_subpart_question(len(parts), True)
+            reused_rows = reused_rows or chosen is not None
+        if chosen is not None:
+            chosen_ids.add(chosen.id)
+            chosen_texts.add(pool_question_fingerprint(chosen))
+            for idx, p in enumerate(parts):
+                sp = chosen.subparts[idx]
+                row["parts"].append({
+                    "label": p,
+                    "text": clean_question_text(sp.get('text') if isinstance(sp, dict) else str(sp)),
+                    "marks": marks_map.get(p),
+                    "co": chosen.co_tags or [],
+                    "rbt": chosen.rbt_level,
+                    "source_qid": chosen.id,
+                })
+            qm = chosen.module or 0
+            if module_percents:
+                qm_eff = qm if qm in remaining_counts else next((m for m, cnt in remaining_counts.items() if cnt >= len(parts)), None)
+                if qm_eff is not None:
+                    remaining_counts[qm_eff] = max(0, remaining_counts[qm_eff] - len(parts))
+            if rbt_active and chosen.rbt_level in remaining_rbt:
+                remaining_rbt[chosen.rbt_level] = max(0, remaining_rbt[chosen.rbt_level] - len(parts))
+            continue
+        for p in parts:
+            row["parts"].append({"label": p, "text": "", "marks": marks_map.get(p), "co": [], "rbt": None})
+            slots.append((row, len(row["parts"]) - 1, marks_map.get(p)))
+    t1 = time.perf_counter()
+    timings['subpart_rows'] += t1 - t0
+
+    tried = set()
+    for relaxed, keep_module, keep_rbt, allow_recent in _SOLVER_RELAXATIONS:
+        module_caps = dict(remaining_counts) if keep_module and module_percents else None
+        rbt_caps = dict(remaining_rbt) if keep_rbt and rbt_active else None
+        key = (repr(module_caps), repr(rbt_caps), allow_recent)
+        if key in tried:
+            continue
+        if tried:
+            stats['relaxation_steps'] += 1
+        tried.add(key)
+        stats['candidates_scanned'] += len(all_q)
+        candidates = []
+        seen = set()
+        for q in all_q:
+            fp = pool_question_fingerprint(q)
+            if question_matches(q, chosen_ids, chosen_texts) or fp in seen:
+                continue
+            if allow_recent or not question_matches(q, blocked_ids, blocked_texts):
+                seen.add(fp)
+                candidates.append(q)
+        # Recently used questions stay candidates here, but only fill what fresh ones cannot
+        avoid = {q.id for q in candidates if question_matches(q, blocked_ids, blocked_texts)} if allow_recent else None
+        picks = assign_blueprint_slots([marks for _, _, marks in slots], candidates, module_caps, rbt_caps, avoid)
+        if picks is None:
+            continue
+        for (row, idx, marks), q in zip(slots, picks):
+            row["parts"][idx] = {
+                "label": row["parts"][idx]["label"],
+                "text": clean_question_text(q.text),
+                "marks": marks,
+                "co": q.co_tags or [],
+                "rbt": q.rbt_level,
+                "source_qid": q.id,
+            }
+        report = {"engine": "solver", "slots": len(slots), "relaxed": []}
+        if reused_rows or any(question_matches(q, blocked_ids, blocked_texts) for q in picks):
+            report["relaxed"].append({"constraint": "recent_drafts", "reason": _SOLVER_RELAX_REASONS['recent_drafts']})
+        if relaxed and relaxed != 'recent_drafts':
+            report["relaxed"].extend({"constraint": c, "reason": _SOLVER_RELAX_REASONS[relaxed]} for c in relaxed.split('+'))
+        timings['slot_assign'] += time.perf_counter() - t1
+        profile_merge(timings, stats)
+        return rows, report
+    timings['slot_assign'] += time.perf_counter() - t1
+    profile_merge(timings, stats)
+    return None, {"engine": "solver", "slots": len(slots), "reason": "not enough questions with the requested marks, even ignoring module/RBT quotas and recent drafts"}
+
+def select_paper_rows(config, all_q, module_groups, blocked_ids, blocked_texts):
+    """Run the configured engine; the greedy engine also fills in when the solver cannot."""
+    engine = config.get('engine') or app.config["PAPER_ENGINE"]
+    if engine == 'solver':
+        rows, report = solve_paper_rows(config, all_q, blocked_ids, blocked_texts)
+        if rows is not None:
+            return rows, report
+        report = {"engine": "greedy", "fallback_reason": report["reason"]}
+    else:
+        report = {"engine": "greedy"}
+    return greedy_paper_rows(config, all_q, module_groups, blocked_ids, blocked_texts), report
+
+def shuffled_module_groups(all_q, rng=None):
+    """Shuffle the pool in place and group it by module (0 = unassigned), each group reshuffled.
+
+    `rng` is a random.Random for seeded generation; the global generator is used otherwise.
+    """
+    if rng is None:
+        import random as rng
+    rng.shuffle(all_q)
+    # Group by module for percentage-based selection
+    module_groups = {}
+    for q in all_q:
+        m = q.module or 0
+        module_groups.setdefault(m, []).append(q)
+    # Shuffle each module pool to avoid repetition patterns
+    for m in list(module_groups.keys()):
+        rng.shuffle(module_groups[m])
+    return module_groups
+
+def new_paper_draft(data, rows, title=None):
+    """PaperDraft for generated rows, with OR markers inserted after the configured questions."""
     # Insert OR markers after specified question numbers
-    or_after = [s.get('after_qno') for s in config.get('or_between', []) if isinstance(s, dict) and 'after_qno' in s]
+    or_after = [s.get('after_qno') for s in data.get('or_between', []) if isinstance(s, dict) and 'after_qno' in s]
     or_after_set = set(or_after)
     with_or = []
     for r in rows:
         with_or.append(r)
         if r.get('type') == 'question' and r.get('qno') in or_after_set:
             with_or.append({"type": "or"})
-    rows = with_or
-    draft = PaperDraft(
-        scheme_id=scheme_id,
-        subject_id=subject_id,
-        title=data.get('title') or 'INTERNAL ASSESSMENT TEST - 1',
+    return PaperDraft(
+        scheme_id=data.get('scheme_id'),
+        subject_id=data.get('subject_id'),
+        title=title or data.get('title') or 'INTERNAL ASSESSMENT TEST - 1',
         header=data.get('header') or {},
         co_table=data.get('co_table') or {},
         rbt_table=data.get('rbt_table') or {},
-        rows=rows,
+        rows=with_or,
     )
-    db.session.add(draft)
+
+# Request fields that influence which questions are selected (title, header, OR markers do not)
+_SELECTION_CONFIG_KEYS = ('questions', 'module_percentages', 'rbt_percentages', 'rbt_enabled', 'lookback_drafts', 'lookback_days')
+_generation_cache = OrderedDict()
+_generation_cache_lock = threading.Lock()
+
+def generation_key(data, pool_version):
+    """Identifies a seeded request: subject, pool version, engine, selection config and seed."""
+    config = {k: data.get(k) for k in _SELECTION_CONFIG_KEYS}
+    config['engine'] = data.get('engine') or app.config["PAPER_ENGINE"]
+    raw = json.dumps([data.get('scheme_id'), data.get('subject_id'), pool_version, config, str(data['seed'])], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def generation_cache_key(key, blocked_ids, blocked_texts):
+    """Cache key for a seeded generation: its generation_key plus the recent-use block set.
+
+    Together these are every input of the selection, so a miss (another worker, a restart,
+    an eviction) selects the same questions again, and a hit is never stale.
+    """
+    raw = json.dumps([key, sorted(blocked_ids), sorted(blocked_texts)])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _generation_cache_get(key):
+    with _generation_cache_lock:
+        hit = _generation_cache.get(key)
+        if hit is None:
+            return None
+        _generation_cache.move_to_end(key)
+    # Stored as JSON so callers can never mutate the cached rows
+    return json.loads(hit)
+
+def _generation_cache_put(key, rows, selection):
+    with _generation_cache_lock:
+        _generation_cache[key] = json.dumps([rows, selection])
+        _generation_cache.move_to_end(key)
+        while len(_generation_cache) > app.config["GENERATION_CACHE_MAX_ENTRIES"]:
+            _generation_cache.popitem(last=False)
+
+@app.route('/api/generate-paper', methods=['POST'])
+def generate_paper():
+    data = request.json or {}
+    scheme_id = data.get('scheme_id')
+    subject_id = data.get('subject_id')
+    config = data
+    errors = lookback_errors(data)
+    if errors:
+        return jsonify({"errors": errors}), 400
+    # Opt-in profiling: phase timings go to Server-Timing, the full profile to a "profile" field
+    show_profile = bool(data.get('profile')) or request.args.get('profile') == '1'
+    profile = None
+    if show_profile or app.config["GENERATION_PROFILING"]:
+        profile = g.generation_profile = GenerationProfile()
+    # With a seed the same request reproduces the same paper, so the result can be reused
+    seed = data.get('seed')
+    key = generation_key(data, question_pool_version(scheme_id, subject_id)) if seed is not None else None
+    # Avoid reusing questions from recent drafts of same subject/scheme (other than this request's own)
+    with profile_phase('recent_usage'):
+        blocked_ids, blocked_texts = recent_usage_blocks(scheme_id, subject_id, data.get('lookback_drafts'), data.get('lookback_days'), key)
+    cache_key = None
+    cached = None
+    if seed is not None:
+        with profile_phase('cache'):
+            cache_key = generation_cache_key(key, blocked_ids, blocked_texts)
+            cached = _generation_cache_get(cache_key)
+    if cached is not None:
+        rows, selection = cached
+        selection['cached'] = True
+    else:
+        # Load pool from DB: prefer APPROVED, then DRAFT if insufficient, then randomize order to avoid repetition
+        with profile_phase('pool_load'):
+            all_q = load_question_pool(scheme_id, subject_id)
+        import random
+        with profile_phase('shuffle'):
+            module_groups = shuffled_module_groups(all_q, random.Random(str(seed)) if seed is not None else None)
+        # Build draft rows and try to auto-fill from bank
+        rows, selection = select_paper_rows(config, all_q, module_groups, blocked_ids, blocked_texts)
+        if cache_key is not None:
+            _generation_cache_put(cache_key, rows, selection)
+    with profile_phase('save'):
+        draft = new_paper_draft(data, rows)
+        draft.generation_key = key
+        db.session.add(draft)
+        db.session.flush()
+        record_question_usage(draft)
+        db.session.commit()
+    body = {"draft_id": draft.id, "paper": {"title": draft.title, "header": draft.header, "rows": draft.rows}, "selection": selection}
+    if profile is None:
+        return jsonify(body)
+    g.generation_profile = None
+    profile.finish()
+    if cached is not None:
+        profile.counters['cache_hits'] += 1
+    record_generation_profile(profile)
+    if show_profile:
+        body["profile"] = profile.to_dict()
+    resp = jsonify(body)
+    resp.headers['Server-Timing'] = profile.server_timing()
+    return resp
+
+def _percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))]
+
+def _profile_summary(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": _percentile(values, 50),
+        "p95": _percentile(values, 95),
+        "max": values[-1],
+    }
+
+@app.route('/api/generation-stats', methods=['GET'])
+def generation_stats():
+    """Aggregate of the recent profiled paper generations of this process"""
+    with _generation_stats_lock:
+        profiles = list(_generation_stats)
+    if not profiles:
+        return jsonify({"profiles": 0, "total_ms": None, "phases_ms": {}, "counters": {}})
+    phases = {}
+    counters = {}
+    for prof in profiles:
+        for name, ms in prof["phases_ms"].items():
+            phases.setdefault(name, []).append(ms)
+        for name, n in prof["counters"].items():
+            counters.setdefault(name, []).append(n)
+    return jsonify({
+        "profiles": len(profiles),
+        "total_ms": _profile_summary([prof["total_ms"] for prof in profiles]),
+        "phases_ms": {name: _profile_summary(v) for name, v in phases.items()},
+        "counters": {name: dict(_profile_summary(v), total=sum(v)) for name, v in counters.items()},
+    })
+
+def _row_question_ids(rows):
+    return {p['source_qid'] for r in rows if r.get('type') == 'question' for p in r.get('parts', []) if p.get('source_qid')}
+
+def variant_overlap_report(variant_rows, labels):
+    """Questions shared between each pair of variants (by id), plus the worst pair."""
+    ids = [_row_question_ids(rows) for rows in variant_rows]
+    pairs = []
+    for i in range(len(ids)):
+        for j in range(i + 1, len(ids)):
+            shared = sorted(ids[i] & ids[j])
+            pairs.append({"variants": [labels[i], labels[j]], "shared": len(shared), "question_ids": shared})
+    return {"pairs": pairs, "max_shared": max((p["shared"] for p in pairs), default=0)}
+
+def select_variant_rows(config, all_q, module_groups, blocked_ids, blocked_texts, count):
+    """Rows and selection report of `count` sets, each avoiding the questions of the sets before it.
+
+    The engines treat earlier sets' questions like recently used ones, so a set only repeats
+    a question the pool cannot replace. `blocked_ids` / `blocked_texts` are extended in place.
+    """
+    by_id = {q.id: q for q in all_q}
+    results = []
+    for _ in range(count):
+        rows, selection = select_paper_rows(config, all_q, module_groups, blocked_ids, blocked_texts)
+        for qid in _row_question_ids(rows):
+            blocked_ids.add(qid)
+            q = by_id.get(qid)
+            if q is not None:
+                blocked_texts.add(pool_question_fingerprint(q))
+        results.append((rows, selection))
+    return results
+
+@app.route('/api/generate-paper-variants', methods=['POST'])
+def generate_paper_variants():
+    """Generate N sets (A, B, C, ...) of one paper from a single pool load.
+
+    Every set avoids the questions of recent drafts and of the sets before it, so sets are
+    disjoint whenever the pool allows and only overlap as a relaxation.
+    """
+    data = request.json or {}
+    scheme_id = data.get('scheme_id')
+    subject_id = data.get('subject_id')
+    count = data.get('variants', 3)
+    if not isinstance(count, int) or count < 1 or count > 26:
+        return jsonify({"errors": ["variants must be an integer between 1 and 26"]}), 400
+    errors = lookback_errors(data)
+    if errors:
+        return jsonify({"errors": errors}), 400
+    all_q = load_question_pool(scheme_id, subject_id)
+    seed = data.get('seed')
+    import random
+    module_groups = shuffled_module_groups(all_q, random.Random(str(seed)) if seed is not None else None)
+    blocked_ids, blocked_texts = recent_usage_blocks(scheme_id, subject_id, data.get('lookback_drafts'), data.get('lookback_days'))
+    base_title = data.get('title') or 'INTERNAL ASSESSMENT TEST - 1'
+    labels = [chr(ord('A') + i) for i in range(count)]
+    results = select_variant_rows(data, all_q, module_groups, blocked_ids, blocked_texts, count)
+    variant_rows = [rows for rows, _ in results]
+    selections = [selection for _, selection in results]
+    drafts = [new_paper_draft(data, rows, title=f"{base_title} - SET {label}") for label, rows in zip(labels, variant_rows)]
+    db.session.add_all(drafts)
+    db.session.flush()
+    for d in drafts:
+        record_question_usage(d)
     db.session.commit()
-    return jsonify({"draft_id": draft.id, "paper": {"title": draft.title, "header": draft.header, "rows": draft.rows}})
+    return jsonify({
+        "variants": [
+            {"label": label, "draft_id": d.id, "paper": {"title": d.title, "header": d.header, "rows": d.rows}, "selection": sel}
+            for label, d, sel in zip(labels, drafts, selections)
+        ],
+        "overlap": variant_overlap_report(variant_rows, labels),
+    })
 
 @app.route('/api/paper-drafts/<int:draft_id>', methods=['GET','PUT'])
 def paper_draft(draft_id):
@@ -1492,9 +3631,86 @@ def paper_draft(draft_id):
                     pass
             else:
                 setattr(draft, field, data[field])
+    if 'rows' in data:
+        record_question_usage(draft)
     db.session.commit()
     return jsonify({"ok": True})
 
+# Relaxation ladder for regenerating one part: (constraint relaxed, keep module, keep RBT, allow recent)
+_PART_RELAXATIONS = [
+    (None, True, True, False),
+    ('recent_drafts', True, True, True),
+    ('rbt', True, False, True),
+    ('module', False, True, True),
+    ('module+rbt', False, False, True),
+]
+
+@app.route('/api/paper-drafts/<int:draft_id>/parts/<qno>/<label>/regenerate', methods=['POST'])
+def regenerate_draft_part(draft_id, qno, label):
+    """Swap one part of a draft for another question with the same marks, module and RBT level"""
+    import random
+    draft = PaperDraft.query.get_or_404(draft_id)
+    rows = json.loads(json.dumps(draft.rows or []))
+    target = None
+    for row in rows:
+        if isinstance(row, dict) and row.get('type') == 'question' and str(row.get('qno')) == qno:
+            for idx, part in enumerate(row.get('parts', [])):
+                if str(part.get('label')) == label:
+                    target = (row, idx)
+    if target is None:
+        return jsonify({"errors": [f"Part {qno}{label} not found in draft"]}), 404
+    row, idx = target
+    part = row['parts'][idx]
+
+    buckets, by_id = question_pool_buckets(draft.scheme_id, draft.subject_id)
+    # The slot keeps its marks, the module of the question it held, and its RBT level
+    current = by_id.get(part.get('source_qid'))
+    marks = part.get('marks') if part.get('marks') is not None else POOL_ANY
+    module = current.module if current is not None and current.module else POOL_ANY
+    rbt = part.get('rbt') or POOL_ANY
+    # Nothing already on this paper may come back
+    used_ids = set()
+    used_texts = set()
+    for r in rows:
+        if isinstance(r, dict) and r.get('type') == 'question':
+            for p in r.get('parts', []):
+                if p.get('source_qid'):
+                    used_ids.add(p['source_qid'])
+                    if p['source_qid'] in by_id:
+                        used_texts.add(pool_question_fingerprint(by_id[p['source_qid']]))
+                if p.get('text'):
+                    used_texts.add(question_fingerprint(p['text']))
+    recent_ids, recent_texts = recent_usage_blocks(draft.scheme_id, draft.subject_id)
+
+    tried = set()
+    for relaxed, keep_module, keep_rbt, allow_recent in _PART_RELAXATIONS:
+        key = (marks, module if keep_module else POOL_ANY, rbt if keep_rbt else POOL_ANY)
+        if (key, allow_recent) in tried:
+            continue
+        tried.add((key, allow_recent))
+        candidates = [
+            q for q in buckets.get(key, ())
+            if not question_matches(q, used_ids, used_texts)
+            and (allow_recent or not question_matches(q, recent_ids, recent_texts))
+        ]
+        if candidates:
+            break
+    else:
+        return jsonify({"errors": ["No replacement question available for this part"]}), 404
+
+    q = random.choice(candidates)
+    new_part = dict(part, text=clean_question_text(q.text), co=q.co_tags or [], rbt=q.rbt_level, source_qid=q.id)
+    row['parts'][idx] = new_part
+    draft.rows = rows
+    record_question_usage(draft)
+    db.session.commit()
+    report = []
+    if question_matches(q, recent_ids, recent_texts):
+        report.append("recent_drafts")
+    if relaxed and relaxed != 'recent_drafts':
+        report.extend(relaxed.split('+'))
+    return jsonify({"part": new_part, "relaxed": report})
+
 # -------- User Registration --------
 @app.route('/api/register', methods=['POST'])
 def register_user():
@@ -1598,5 +3814,15 @@ def update_user(firebase_uid):
         db.session.rollback()
         return jsonify({"error": f"Failed to update user: {str(e)}"}), 500
 
+# Last, so migrations can use every helper above
+with app.app_context():
+    if app.config["AUTO_MIGRATE"]:
+        run_migrations()
+
 if __name__ == '__main__':
+    # The development server always brings its database up to date first, and fails
+    # uploads the previous run never finished so their clients stop polling
+    with app.app_context():
+        run_migrations()
+        fail_interrupted_ingest_jobs()
     app.run(debug=True)
@@ -0,0 +1,73 @@
+"""
+Compare PDF extraction backends: throughput and parse_bank_text parity.
+
+    python benchmarks/bench_backends.py --pages 100
+    python benchmarks/bench_backends.py --pdf uploads/some_bank.pdf --pdf uploads/other.pdf
+
+pdfplumber is the reference; every other backend is timed on the same file and
+its parse result is compared question by question against pdfplumber's.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "questgen_bench.db"))
+
+from app import PDF_EXTRACTORS, extract_pdf_text, parse_bank_text  # noqa: E402
+from benchmarks.synthetic_bank import make_bank_text, write_pdf  # noqa: E402
+
+
+def time_backend(path, backend, workers, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = extract_pdf_text(path, workers=workers, backend=backend)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, text
+
+
+def compare(path, pages, workers, repeat):
+    results = {b: time_backend(path, b, workers, repeat) for b in PDF_EXTRACTORS}
+    base_time, base_text = results['pdfplumber']
+    base = parse_bank_text(base_text)
+    print(f"{os.path.basename(path)}: pages={pages} questions={len(base)}")
+    for backend, (best, text) in results.items():
+        parsed = parse_bank_text(text)
+        diff = sum(1 for a, b in zip(parsed, base) if a != b) + abs(len(parsed) - len(base))
+        print(f"  {backend:<11} best={best:.3f}s pages/s={pages / best:8.1f} "
+              f"speedup={base_time / best:5.2f}x questions={len(parsed)} differing={diff}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=100)
+    ap.add_argument("--pdf", action="append", default=[], help="benchmark an existing PDF instead")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.pdf:
+        import pdfplumber
+        for path in args.pdf:
+            with pdfplumber.open(path) as pdf:
+                pages = len(pdf.pages)
+            compare(path, pages, args.workers, args.repeat)
+        return
+
+    lines_per_page = 45
+    n_questions = int(args.pages * lines_per_page / 1.6)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bank.pdf")
+        text = make_bank_text(n_questions)
+        while write_pdf(text, path, lines_per_page) < args.pages:
+            n_questions += 20
+            text = make_bank_text(n_questions)
+        compare(path, args.pages, args.workers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark sequential vs. parallel per-page PDF text extraction.
+
+    python benchmarks/bench_extract.py --pages 100 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "questgen_bench.db"))
+
+from app import extract_pdf_text, parse_bank_text  # noqa: E402
+from benchmarks.synthetic_bank import make_bank_text, write_pdf  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=100)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    lines_per_page = 45
+    # ~1.6 lines per question on average (every fifth question has three subparts)
+    n_questions = int(args.pages * lines_per_page / 1.6)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bank.pdf")
+        text = make_bank_text(n_questions)
+        while write_pdf(text, path, lines_per_page) < args.pages:
+            n_questions += 20
+            text = make_bank_text(n_questions)
+
+        results = {}
+        for workers in sorted({1, args.workers}):
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                out = extract_pdf_text(path, workers=workers)
+                dt = time.perf_counter() - t0
+                best = dt if best is None else min(best, dt)
+            results[workers] = (best, out)
+
+        base_time, base_text = results[1]
+        print(f"pages={args.pages} questions={n_questions} cpus={os.cpu_count()}")
+        for workers, (best, out) in results.items():
+            same = parse_bank_text(out) == parse_bank_text(base_text)
+            print(f"workers={workers:<3} best={best:.3f}s speedup={base_time / best:.2f}x same_parse={same}")
+
+
+if __name__ == "__main__":
+    main()
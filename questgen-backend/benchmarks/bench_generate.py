@@ -0,0 +1,248 @@
+"""
+Paper generation scaling benchmark.
+
+Seeds a throwaway SQLite database with synthetic subjects of each pool size
+(realistic module, marks, RBT and CO mixes, optionally without any subpart
+questions) and times POST /api/generate-paper for a set of blueprints with
+and without module/RBT percentages. The first call per subject is reported
+separately as the cold (pool loading) latency. Results are written as JSON
+with latency percentiles, per-phase means from the generation profile, and
+scaling curves (p50 against pool size, with the log-log slope between sizes):
+
+    python benchmarks/bench_generate.py --sizes 1000 10000 100000 --output gen.json
+    python benchmarks/bench_generate.py --sizes 1000 10000 --engines greedy --repeat 50
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix="questgen_bench_")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "bench.db")
+os.environ["AUTO_MIGRATE"] = "1"  # build the throwaway schema on import
+
+from app import (  # noqa: E402
+    app, db, QuestionStatus, Scheme, Subject, _pool_cache, bulk_insert_questions, question_fingerprint,
+)
+from benchmarks.synthetic_bank import TOPICS, VERBS  # noqa: E402
+
+# Rough shape of the uploaded banks: most questions carry module, marks and RBT tags,
+# lower RBT levels dominate and a minority have subparts.
+MODULE_WEIGHTS = {0: 8, 1: 20, 2: 20, 3: 18, 4: 17, 5: 17}
+MARKS_WEIGHTS = {2: 6, 4: 14, 5: 16, 6: 18, 7: 8, 8: 18, 10: 20}
+RBT_WEIGHTS = {"L1": 22, "L2": 30, "L3": 24, "L4": 12, "L5": 7, "L6": 5}
+CO_LEVELS = ["CO1", "CO2", "CO3", "CO4", "CO5"]
+
+BLUEPRINTS = {
+    "plain": {
+        "questions": [{"qno": q, "parts": ["a", "b"], "marks": {"a": 6, "b": 4}} for q in range(1, 6)],
+        "rbt_enabled": False,
+    },
+    "modules": {
+        "questions": [{"qno": q, "parts": ["a", "b"], "marks": {"a": 6, "b": 4}} for q in range(1, 6)],
+        "module_percentages": {"1": 20, "2": 20, "3": 20, "4": 20, "5": 20},
+        "rbt_enabled": False,
+    },
+    "modules_rbt": {
+        "questions": [{"qno": q, "parts": ["a", "b"], "marks": {"a": 6, "b": 4}} for q in range(1, 6)],
+        "module_percentages": {"1": 20, "2": 20, "3": 20, "4": 20, "5": 20},
+        "rbt_percentages": {"L1": 20, "L2": 30, "L3": 30, "L4": 20},
+    },
+    "three_parts_modules_rbt": {
+        "questions": [{"qno": q, "parts": ["a", "b", "c"], "marks": {"a": 8, "b": 7, "c": 5}} for q in range(1, 9)],
+        "module_percentages": {"1": 25, "2": 25, "3": 25, "4": 25},
+        "rbt_percentages": {"L1": 15, "L2": 35, "L3": 35, "L4": 15},
+        "or_between": [{"after_qno": q} for q in (1, 3, 5, 7)],
+    },
+}
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def synthetic_rows(n, scheme_id, subject_id, subpart_share, seed):
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    texts = []
+    for i in range(n):
+        # A few percent of questions repeat earlier text, as re-uploaded banks do
+        if texts and rng.random() < 0.03:
+            text = rng.choice(texts)
+        else:
+            text = f"{rng.choice(VERBS)} {rng.choice(TOPICS)} with reference to case {i}"
+            texts.append(text)
+        subparts = None
+        if rng.random() < subpart_share:
+            subparts = [{"label": label, "text": f"{rng.choice(VERBS)} {rng.choice(TOPICS)}"}
+                        for label in "abc"[:rng.choice([2, 3, 3])]]
+        yield {
+            "scheme_id": scheme_id,
+            "subject_id": subject_id,
+            "q_type": "DESCRIPTIVE",
+            "text": text,
+            "text_fingerprint": question_fingerprint(text),
+            "marks": weighted(rng, MARKS_WEIGHTS) if rng.random() < 0.95 else None,
+            "co_tags": rng.sample(CO_LEVELS, rng.choice([1, 1, 1, 2])),
+            "rbt_level": weighted(rng, RBT_WEIGHTS) if rng.random() < 0.9 else None,
+            "subparts": subparts,
+            "module": weighted(rng, MODULE_WEIGHTS),
+            "status": QuestionStatus.APPROVED if rng.random() < 0.6 else QuestionStatus.DRAFT,
+            "parse_confidence": 0.6,
+            "source_file": f"bench_{subject_id}.pdf",
+            "created_at": base + timedelta(seconds=rng.randint(0, 10 ** 7)),
+        }
+
+
+def seed_subject(scheme_id, n, subpart_share):
+    subject = Subject(scheme_id=scheme_id, name=f"bench {n} subparts={subpart_share}")
+    db.session.add(subject)
+    db.session.flush()
+    t0 = time.perf_counter()
+    bulk_insert_questions(synthetic_rows(n, scheme_id, subject.id, subpart_share, seed=n))
+    db.session.commit()
+    return subject.id, time.perf_counter() - t0
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def latency_summary(ms):
+    return {
+        "runs": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def run_case(client, scheme_id, subject_id, blueprint, engine, repeat):
+    body = dict(BLUEPRINTS[blueprint], scheme_id=scheme_id, subject_id=subject_id, engine=engine, profile=True)
+    _pool_cache.clear()
+    latencies = []
+    phases = {}
+    counters = {}
+    selection = None
+    cold_ms = None
+    for i in range(repeat + 1):
+        t0 = time.perf_counter()
+        resp = client.post("/api/generate-paper", json=body)
+        ms = (time.perf_counter() - t0) * 1000
+        if resp.status_code != 200:
+            raise RuntimeError(f"generate-paper failed: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+        data = resp.get_json()
+        if i == 0:
+            cold_ms = ms
+            continue
+        latencies.append(ms)
+        selection = data["selection"]
+        for name, v in data["profile"]["phases_ms"].items():
+            phases.setdefault(name, []).append(v)
+        for name, v in data["profile"]["counters"].items():
+            counters.setdefault(name, []).append(v)
+    parts = [p for r in data["paper"]["rows"] if r.get("type") == "question" for p in r["parts"]]
+    return dict(
+        latency_summary(latencies),
+        cold_ms=round(cold_ms, 3),
+        phases_mean_ms={name: round(sum(v) / len(v), 3) for name, v in phases.items()},
+        counters_mean={name: round(sum(v) / len(v), 1) for name, v in counters.items()},
+        engine_used=selection.get("engine"),
+        relaxed=[r["constraint"] for r in selection.get("relaxed", [])],
+        blank_parts=sum(1 for p in parts if not p.get("text")),
+    )
+
+
+def scaling_curves(results):
+    curves = {}
+    for r in results:
+        curves.setdefault(r["case"], []).append((r["pool_size"], r["p50_ms"]))
+    out = {}
+    for case, points in curves.items():
+        points.sort()
+        slopes = []
+        for (n0, t0), (n1, t1) in zip(points, points[1:]):
+            # log-log slope: ~0 is flat, ~1 is linear in the pool size
+            slopes.append(round(math.log(t1 / t0) / math.log(n1 / n0), 3) if t0 > 0 and t1 > 0 else None)
+        out[case] = {"pool_sizes": [n for n, _ in points], "p50_ms": [t for _, t in points], "loglog_slopes": slopes}
+    return out
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--subpart-shares", type=float, nargs="+", default=[0.15, 0.0],
+                    help="fraction of questions with subparts; one subject per size and share")
+    ap.add_argument("--blueprints", nargs="+", default=list(BLUEPRINTS), choices=list(BLUEPRINTS))
+    ap.add_argument("--engines", nargs="+", default=["solver", "greedy"], choices=["solver", "greedy"])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--output", help="write JSON results to this file")
+    args = ap.parse_args()
+
+    random.seed(0)
+    client = app.test_client()
+    seeds = []
+    results = []
+    with app.app_context():
+        scheme = Scheme(name="bench", department="bench")
+        db.session.add(scheme)
+        db.session.commit()
+        scheme_id = scheme.id
+        for n in args.sizes:
+            for share in args.subpart_shares:
+                subject_id, seed_s = seed_subject(scheme_id, n, share)
+                seeds.append({"pool_size": n, "subpart_share": share, "subject_id": subject_id, "seed_s": round(seed_s, 3)})
+    for s in seeds:
+        for blueprint in args.blueprints:
+            for engine in args.engines:
+                case = f"{blueprint}/{engine}/subparts={s['subpart_share']}"
+                r = run_case(client, scheme_id, s["subject_id"], blueprint, engine, args.repeat)
+                results.append(dict(case=case, pool_size=s["pool_size"], subpart_share=s["subpart_share"],
+                                    blueprint=blueprint, engine=engine, **r))
+                print(f"{s['pool_size']:>7} {case:<45} p50={r['p50_ms']:9.2f}ms p99={r['p99_ms']:9.2f}ms "
+                      f"cold={r['cold_ms']:9.2f}ms")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "seeded": seeds,
+        "results": results,
+        "scaling": scaling_curves(results),
+    }
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(out)
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
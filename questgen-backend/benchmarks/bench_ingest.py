@@ -0,0 +1,148 @@
+"""
+Ingestion benchmark suite.
+
+Generates synthetic banks (text + PDF) and times each stage of
+upload_question_bank separately: pdfplumber extraction, parse_bank_text,
+clean_question_text and the DB insert. Results are written as JSON so
+runs can be compared:
+
+    python benchmarks/bench_ingest.py --sizes 200 2000 --output before.json
+    python benchmarks/bench_ingest.py --sizes 200 2000 --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix="questgen_bench_")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "bench.db")
+os.environ["AUTO_MIGRATE"] = "1"  # build the throwaway schema on import
+
+from app import (  # noqa: E402
+    app, db, Question, Scheme, Subject, extract_pdf_text, parse_bank_text,
+    clean_question_text, question_row_from_parsed, bulk_insert_questions,
+)
+from benchmarks.synthetic_bank import write_bank  # noqa: E402
+
+PHASES = ["extract", "parse", "clean", "insert"]
+
+
+def timed(fn, repeat):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    return runs, result
+
+
+def run_size(n_questions, repeat, extract_repeat, ids):
+    prefix = os.path.join(_tmp, f"bank_{n_questions}")
+    _, pages = write_bank(prefix, n_questions)
+    phases = {}
+
+    runs, text = timed(lambda: extract_pdf_text(prefix + ".pdf", workers=1), extract_repeat)
+    phases["extract"] = (runs, pages, "pages")
+
+    runs, items = timed(lambda: parse_bank_text(text), repeat)
+    phases["parse"] = (runs, len(items), "questions")
+
+    pieces = [it["text"] for it in items] + [sp["text"] for it in items for sp in it["subparts"] or []]
+    runs, _ = timed(lambda: [clean_question_text(p) for p in pieces], repeat)
+    phases["clean"] = (runs, len(pieces), "texts")
+
+    def insert():
+        source = f"bench_{n_questions}.pdf"
+        bulk_insert_questions(question_row_from_parsed(it, ids[0], ids[1], 1, source) for it in items)
+        db.session.commit()
+        Question.query.filter_by(source_file=source).delete()
+        db.session.commit()
+    with app.app_context():
+        runs, _ = timed(insert, repeat)
+    phases["insert"] = (runs, len(items), "questions")
+
+    out = {"questions": n_questions, "pages": pages, "phases": {}}
+    for name, (runs, units, unit_name) in phases.items():
+        best = min(runs)
+        out["phases"][name] = {
+            "best_s": round(best, 6),
+            "mean_s": round(sum(runs) / len(runs), 6),
+            "runs_s": [round(r, 6) for r in runs],
+            "units": units,
+            "unit": unit_name,
+            "per_s": round(units / best, 1) if best else None,
+        }
+    return out
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline):
+    base = {r["questions"]: r for r in baseline["results"]}
+    print(f"\ncompared with {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')}):")
+    for r in current["results"]:
+        b = base.get(r["questions"])
+        if not b:
+            continue
+        for name in PHASES:
+            cur, old = r["phases"][name]["best_s"], b["phases"][name]["best_s"]
+            change = (cur - old) / old * 100 if old else 0.0
+            print(f"  {r['questions']:>6} questions  {name:<8} {old:.4f}s -> {cur:.4f}s ({change:+.1f}%)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[200, 2000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--extract-repeat", type=int, default=1, help="extraction is slow; fewer repeats by default")
+    ap.add_argument("--output", help="write JSON results to this file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = ap.parse_args()
+
+    with app.app_context():
+        scheme = Scheme(name="bench", department="bench")
+        db.session.add(scheme)
+        db.session.flush()
+        subject = Subject(scheme_id=scheme.id, name="bench")
+        db.session.add(subject)
+        db.session.commit()
+        ids = (scheme.id, subject.id)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": [run_size(n, args.repeat, args.extract_repeat, ids) for n in args.sizes],
+    }
+    for r in results["results"]:
+        print(f"{r['questions']} questions / {r['pages']} pages")
+        for name in PHASES:
+            ph = r["phases"][name]
+            print(f"  {name:<8} {ph['best_s']:.4f}s  ({ph['per_s']:,.0f} {ph['unit']}/s)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            compare(results, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare the ORM add() loop with bulk_insert_questions for a large import.
+
+    python benchmarks/bench_insert.py --questions 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix="questgen_bench_")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "bench.db")
+os.environ["AUTO_MIGRATE"] = "1"  # build the throwaway schema on import
+
+from app import app, db, Question, Scheme, Subject, parse_bank_text, question_row_from_parsed, bulk_insert_questions  # noqa: E402
+from benchmarks.synthetic_bank import make_bank_text  # noqa: E402
+
+
+def orm_loop(items, scheme_id, subject_id):
+    for item in items:
+        row = question_row_from_parsed(item, scheme_id, subject_id, 1, "bench_orm.pdf")
+        db.session.add(Question(**row))
+
+
+def bulk(items, scheme_id, subject_id):
+    bulk_insert_questions(question_row_from_parsed(item, scheme_id, subject_id, 1, "bench_bulk.pdf") for item in items)
+
+
+def measure(fn, items, scheme_id, subject_id):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(items, scheme_id, subject_id)
+    db.session.commit()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return dt, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=5000)
+    args = ap.parse_args()
+    items = parse_bank_text(make_bank_text(args.questions))
+    with app.app_context():
+        scheme = Scheme(name="bench", department="bench")
+        db.session.add(scheme)
+        db.session.flush()
+        subject = Subject(scheme_id=scheme.id, name="bench")
+        db.session.add(subject)
+        db.session.commit()
+        ids = (scheme.id, subject.id)
+    results = {}
+    for name, fn in (("orm", orm_loop), ("bulk", bulk)):
+        with app.app_context():
+            results[name] = measure(fn, items, *ids)
+    for name, (dt, peak) in results.items():
+        print(f"{name:<5} {args.questions} questions: {dt:.3f}s, peak {peak / 1e6:.1f} MB")
+    print(f"speedup {results['orm'][0] / results['bulk'][0]:.2f}x, "
+          f"memory {results['orm'][1] / results['bulk'][1]:.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
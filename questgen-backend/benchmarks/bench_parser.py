@@ -0,0 +1,87 @@
+"""
+Regression check and micro-benchmark for parse_bank_text / clean_question_text.
+
+Compares the compiled parser in app.py against the frozen original in
+legacy_parser.py on every file in parser_corpus/ plus a synthetic bank,
+then reports questions parsed per second for both.
+
+    python benchmarks/bench_parser.py --questions 5000
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "questgen_bench.db"))
+
+import app  # noqa: E402
+from benchmarks import legacy_parser  # noqa: E402
+from benchmarks.synthetic_bank import make_bank_text  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_corpus")
+
+
+def load_corpus():
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8", newline="") as fh:
+            corpus[os.path.basename(path)] = fh.read()
+    return corpus
+
+
+def check_regressions(corpus):
+    failures = []
+    for name, text in corpus.items():
+        for module in (None, 3):
+            if app.parse_bank_text(text, module) != legacy_parser.parse_bank_text(text, module):
+                failures.append(f"{name}: parse_bank_text(module={module})")
+        for item in legacy_parser.parse_bank_text(text):
+            pieces = [item["text"]] + [sp["text"] for sp in item["subparts"] or []]
+            for piece in pieces:
+                if app.clean_question_text(piece) != legacy_parser.clean_question_text(piece):
+                    failures.append(f"{name}: clean_question_text({piece[:40]!r})")
+    return failures
+
+
+def throughput(parse, clean, text, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        items = parse(text)
+        for item in items:
+            clean(item["text"])
+            for sp in item["subparts"] or []:
+                clean(sp["text"])
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+        count = len(items)
+    return count / best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    corpus = load_corpus()
+    corpus["synthetic"] = make_bank_text(args.questions)
+    failures = check_regressions(corpus)
+    print(f"regression corpus: {len(corpus)} texts, {len(failures)} mismatches")
+    for f in failures:
+        print("  MISMATCH", f)
+
+    text = corpus["synthetic"]
+    before = throughput(legacy_parser.parse_bank_text, legacy_parser.clean_question_text, text, args.repeat)
+    after = throughput(app.parse_bank_text, app.clean_question_text, text, args.repeat)
+    print(f"legacy:   {before:,.0f} questions/s")
+    print(f"compiled: {after:,.0f} questions/s ({after / before:.2f}x)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Equivalence check for the greedy paper engine.
+
+Builds random question pools and blueprints (module and RBT percentages,
+subpart questions, repeated texts, questions blocked by recent drafts) and
+compares greedy_paper_rows in app.py row for row against the frozen
+original selection in legacy_generate.py, both given the same shuffle.
+Exits non-zero on any mismatch.
+
+    python benchmarks/check_generate.py
+    python benchmarks/check_generate.py --trials 2000 --seed 5
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "questgen_bench.db"))
+
+from app import (  # noqa: E402
+    PoolQuestion, greedy_paper_rows, normalize_question_text, question_fingerprint, shuffled_module_groups,
+)
+from benchmarks import legacy_generate  # noqa: E402
+
+
+def random_pool(rng, n):
+    pool = []
+    for i in range(n):
+        # Texts repeat across questions, as re-uploaded banks do
+        text = f"Explain topic {rng.randint(0, n // 2)} [CO{rng.randint(1, 5)}]"
+        subparts = None
+        if rng.random() < 0.15:
+            subparts = [{"label": label, "text": f"sub {rng.randint(0, 50)} {label}"} for label in "abc"[:rng.randint(1, 3)]]
+        pool.append(PoolQuestion(i + 1, text, rng.choice([5, 6, 8, 10, None]), rng.sample(["CO1", "CO2", "CO3"], rng.randint(0, 2)),
+                                 rng.choice(["L1", "L2", "L3", "L4", None]), subparts, rng.choice([0, 1, 2, 3, 4, 5, None]),
+                                 question_fingerprint(text)))
+    return pool
+
+
+def random_config(rng):
+    config = {"questions": [{"qno": q, "parts": ["a", "b", "c"][:rng.randint(1, 3)],
+                             "marks": {"a": rng.choice([5, 6, 8, 10]), "b": rng.choice([5, 10]), "c": 6}}
+                            for q in range(1, rng.randint(2, 7))]}
+    if rng.random() < 0.6:
+        config["module_percentages"] = dict(zip(["1", "2", "3"], rng.choice([[40, 30, 30], [50, 50, 0], [100, 0, 0], [20, 20, 20]])))
+    if rng.random() < 0.6:
+        config["rbt_percentages"] = dict(zip(["L1", "L2", "L3"], rng.choice([[30, 40, 30], [0, 50, 50], [100, 0, 0]])))
+    if rng.random() < 0.2:
+        config["rbt_enabled"] = False
+    return config
+
+
+def check(trials, seed):
+    failures = []
+    for trial in range(trials):
+        rng = random.Random(seed * 100003 + trial)
+        pool = random_pool(rng, rng.randint(0, 120))
+        config = random_config(rng)
+        blocked_ids = {q.id for q in pool if rng.random() < 0.2}
+        blocked = [q for q in pool if rng.random() < 0.05]
+        shuffle_seed = rng.random()
+
+        legacy_q = list(pool)
+        legacy_groups = shuffled_module_groups(legacy_q, random.Random(shuffle_seed))
+        expected = legacy_generate.paper_rows(copy.deepcopy(config), legacy_q, legacy_groups, set(blocked_ids),
+                                              {normalize_question_text(q.text) for q in blocked})
+        current_q = list(pool)
+        current_groups = shuffled_module_groups(current_q, random.Random(shuffle_seed))
+        actual = greedy_paper_rows(copy.deepcopy(config), current_q, current_groups, set(blocked_ids),
+                                   {q.text_fingerprint for q in blocked})
+        if actual != expected:
+            failures.append(f"trial {trial}: expected {json.dumps(expected)[:200]} got {json.dumps(actual)[:200]}")
+    print(f"greedy_paper_rows: {trials - len(failures)}/{trials} identical to the original selection")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trials", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    failures = check(args.trials, args.seed)
+    for f in failures[:10]:
+        print("FAIL", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
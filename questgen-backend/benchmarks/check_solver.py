@@ -0,0 +1,214 @@
+"""
+Brute-force check of the blueprint solver.
+
+Solves thousands of small random slot-assignment instances with
+assign_blueprint_slots and compares each answer against an exhaustive search:
+the picks must respect marks and quotas, an instance the search can fill must
+be filled, and no more avoided (recently used) questions may be taken than
+the search needs. solve_paper_rows is then run on random pools to check
+marks, text reuse and quotas on whole papers, and paper sets drawn from a
+pool slightly too small to be disjoint must repeat only the shortfall.
+Exits non-zero on any failure.
+
+    python benchmarks/check_solver.py
+    python benchmarks/check_solver.py --instances 10000 --seed 3
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+from collections import Counter, namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "questgen_bench.db"))
+
+from app import (  # noqa: E402
+    PoolQuestion, allocate_by_percent, assign_blueprint_slots, question_fingerprint, select_variant_rows,
+    solve_paper_rows, variant_overlap_report,
+)
+
+Candidate = namedtuple("Candidate", "id marks module rbt_level")
+
+
+def valid(slots, picks, module_caps, rbt_caps):
+    if len({q.id for q in picks}) != len(picks):
+        return False
+    if any(marks is not None and q.marks != marks for marks, q in zip(slots, picks)):
+        return False
+    if rbt_caps is not None:
+        levels = Counter(q.rbt_level for q in picks)
+        if any(levels[lvl] > rbt_caps.get(lvl, 0) for lvl in levels):
+            return False
+    if module_caps is not None:
+        # Module 0 questions may fill whatever the assigned modules leave over
+        modules = Counter(q.module for q in picks if q.module)
+        if any(modules[m] > module_caps.get(m, 0) for m in modules):
+            return False
+        spare = sum(c - modules.get(m, 0) for m, c in module_caps.items())
+        if sum(1 for q in picks if not q.module) > spare:
+            return False
+    return True
+
+
+def least_avoided(slots, candidates, module_caps, rbt_caps, avoid):
+    """Fewest avoided candidates over every valid assignment, or None when none exists."""
+    best = None
+    for picks in itertools.permutations(candidates, len(slots)):
+        if valid(slots, picks, module_caps, rbt_caps):
+            used = sum(1 for q in picks if q.id in avoid)
+            best = used if best is None else min(best, used)
+            if best == 0:
+                break
+    return best
+
+
+def random_instance(rng):
+    slots = [rng.choice([4, 6, 6, None]) for _ in range(rng.randint(1, 4))]
+    candidates = [Candidate(i, rng.choice([4, 6, 8]), rng.choice([0, 1, 2, 3]), rng.choice(["L1", "L2", "L3", None]))
+                  for i in range(rng.randint(3, 8))]
+    module_caps = {m: rng.randint(0, 2) for m in (1, 2, 3)} if rng.random() < 0.7 else None
+    rbt_caps = {lvl: rng.randint(0, 2) for lvl in ("L1", "L2", "L3")} if rng.random() < 0.7 else None
+    avoid = {q.id for q in candidates if rng.random() < 0.4}
+    return slots, candidates, module_caps, rbt_caps, avoid
+
+
+def check_assignments(instances, seed):
+    """Exact for a single quota; with both quotas the solver is a bounded search, so misses are counted."""
+    rng = random.Random(seed)
+    stats = Counter()
+    failures = []
+    for i in range(instances):
+        slots, candidates, module_caps, rbt_caps, avoid = random_instance(rng)
+        picks = assign_blueprint_slots(slots, candidates, module_caps, rbt_caps, avoid)
+        best = least_avoided(slots, candidates, module_caps, rbt_caps, avoid)
+        both = module_caps is not None and rbt_caps is not None
+        stats["feasible"] += best is not None
+        if picks is not None and not valid(slots, picks, module_caps, rbt_caps):
+            failures.append(f"instance {i}: invalid assignment")
+        elif best is not None and picks is None:
+            stats["missed (both quotas)" if both else "missed"] += 1
+            if not both:
+                failures.append(f"instance {i}: feasible but not solved")
+        elif picks is not None:
+            used = sum(1 for q in picks if q.id in avoid)
+            if used > best:
+                stats["extra avoided (both quotas)" if both else "extra avoided"] += used - best
+                if not both:
+                    failures.append(f"instance {i}: {used} avoided questions taken, {best} needed")
+    print(f"assign_blueprint_slots: {instances} instances, {dict(stats)}")
+    return failures
+
+
+def random_pool(rng, n, subparts=True):
+    pool = []
+    for i in range(n):
+        text = f"Explain topic {rng.randint(0, n // 2)} [CO{rng.randint(1, 5)}]"
+        sub = None
+        if subparts and rng.random() < 0.15:
+            sub = [{"label": label, "text": f"sub {rng.randint(0, 50)} {label}"} for label in "abc"[:rng.randint(1, 3)]]
+        pool.append(PoolQuestion(i + 1, text, rng.choice([5, 6, 8, 10, None]), rng.sample(["CO1", "CO2", "CO3"], rng.randint(0, 2)),
+                                 rng.choice(["L1", "L2", "L3", "L4", None]), sub, rng.choice([0, 1, 2, 3, 4, 5, None]),
+                                 question_fingerprint(text)))
+    return pool
+
+
+def random_config(rng):
+    config = {"questions": [{"qno": q, "parts": ["a", "b"], "marks": {"a": rng.choice([5, 6, 8, 10]), "b": rng.choice([5, 10])}}
+                            for q in range(1, rng.randint(2, 7))]}
+    if rng.random() < 0.6:
+        config["module_percentages"] = dict(zip(["1", "2", "3"], rng.choice([[40, 30, 30], [50, 50, 0], [100, 0, 0]])))
+    if rng.random() < 0.6:
+        config["rbt_percentages"] = dict(zip(["L1", "L2", "L3"], rng.choice([[30, 40, 30], [0, 50, 50], [100, 0, 0]])))
+    return config
+
+
+def check_papers(papers, seed):
+    rng = random.Random(seed)
+    failures = []
+    fallbacks = 0
+    for i in range(papers):
+        pool = random_pool(rng, rng.randint(0, 200), subparts=rng.random() < 0.5)
+        rng.shuffle(pool)
+        config = random_config(rng)
+        blocked = {q.id for q in pool if rng.random() < 0.2}
+        rows, report = solve_paper_rows(config, pool, blocked, set())
+        if rows is None:
+            fallbacks += 1
+            continue
+        by_id = {q.id: q for q in pool}
+        parts = [p for row in rows for p in row["parts"]]
+        singles = [by_id[p["source_qid"]] for p in parts if not by_id[p["source_qid"]].subparts]
+        if len({q.text_fingerprint for q in singles}) != len(singles):
+            failures.append(f"paper {i}: question text used twice")
+        if any(not by_id[p["source_qid"]].subparts and by_id[p["source_qid"]].marks != p["marks"] for p in parts):
+            failures.append(f"paper {i}: marks mismatch")
+        relaxed = {r["constraint"] for r in report["relaxed"]}
+        if "recent_drafts" not in relaxed and any(p["source_qid"] in blocked for p in parts):
+            failures.append(f"paper {i}: recent question used without reporting it")
+        if not singles or len(singles) != len(parts):
+            continue
+        total = len(parts)
+        if "module_percentages" in config and "module_percentages" not in relaxed:
+            caps = allocate_by_percent({int(k): v for k, v in config["module_percentages"].items()}, total)
+            modules = Counter(q.module for q in singles if q.module)
+            if any(modules[m] > caps.get(m, 0) for m in modules):
+                failures.append(f"paper {i}: module quota exceeded")
+        if "rbt_percentages" in config and "rbt_percentages" not in relaxed:
+            caps = allocate_by_percent(config["rbt_percentages"], total)
+            levels = Counter(q.rbt_level for q in singles)
+            if any(levels[lvl] > caps.get(lvl, 0) for lvl in levels):
+                failures.append(f"paper {i}: RBT quota exceeded")
+    print(f"solve_paper_rows: {papers} papers, {fallbacks} left to the greedy engine")
+    return failures
+
+
+def check_reuse_preference():
+    """One slot short of fresh questions must not pull the whole paper from recent drafts."""
+    pool = [PoolQuestion(i, f"question {i}", 10, [], "L2", None, 1, question_fingerprint(f"question {i}"))
+            for i in range(1, 14)]
+    config = {"questions": [{"qno": 1, "parts": ["a", "b", "c", "d"], "marks": {p: 10 for p in "abcd"}}]}
+    rows, _ = solve_paper_rows(config, pool, set(range(1, 11)), set())
+    reused = sum(1 for p in rows[0]["parts"] if p["source_qid"] <= 10)
+    return [] if reused == 1 else [f"reuse preference: {reused} recent questions taken, 1 needed"]
+
+
+def check_variant_overlap():
+    """Sets drawn from a pool slightly too small to be disjoint repeat only the shortfall."""
+    failures = []
+    config = {"engine": "solver", "questions": [{"qno": 1, "parts": ["a", "b", "c", "d"], "marks": {p: 10 for p in "abcd"}}]}
+    for count, size in ((2, 7), (3, 11), (3, 9), (4, 15)):
+        pool = [PoolQuestion(i, f"question {i}", 10, [], "L2", None, 1, question_fingerprint(f"question {i}"))
+                for i in range(1, size + 1)]
+        results = select_variant_rows(config, pool, {1: list(pool)}, set(), set(), count)
+        variant_rows = [rows for rows, _ in results]
+        ids = [{p["source_qid"] for r in rows for p in r["parts"]} for rows in variant_rows]
+        repeated = sum(len(s) for s in ids) - len(set().union(*ids))
+        shortfall = max(0, 4 * count - size)
+        if repeated != shortfall:
+            overlap = variant_overlap_report(variant_rows, [str(i) for i in range(count)])
+            failures.append(f"variants {count} from {size} questions: {repeated} repeats, {shortfall} needed "
+                            f"(max shared {overlap['max_shared']})")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--instances", type=int, default=3000)
+    ap.add_argument("--papers", type=int, default=400)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    failures = check_assignments(args.instances, args.seed)
+    failures += check_papers(args.papers, args.seed)
+    failures += check_reuse_preference()
+    failures += check_variant_overlap()
+    for f in failures[:20]:
+        print("FAIL", f)
+    print(f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
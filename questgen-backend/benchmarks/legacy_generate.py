@@ -0,0 +1,346 @@
+"""
+Frozen copy of the original paper selection in generate_paper (before the
+candidate index, fingerprints and the solver engine). Used as the reference
+when checking greedy_paper_rows in app.py (see check_generate.py).
+Do not "fix" anything in here.
+"""
+from benchmarks.legacy_parser import clean_question_text
+
+
+def paper_rows(config, all_q, module_groups, blocked_ids, blocked_texts):
+    """Rows the original generate_paper built; `blocked_texts` holds normalized texts."""
+    rows = []
+    chosen_ids = set()
+    chosen_texts = set()
+    def norm_text(s):
+        return (clean_question_text(s or '') or '').lower().strip()
+    def pick_question(target_marks=None, prefer_rbt=None, prefer_co=None, prefer_module=None, ignore_rbt_allocation=False, ignore_module_allocation=False, allow_reuse=False):
+        # 1) exact marks match with optional module/RBT constraints and not used
+        search_pools = []
+        if prefer_module and not ignore_module_allocation:
+            # Combine preferred module pool with unassigned (module 0) so that unassigned can satisfy any slot
+            pool_pref = list(module_groups.get(prefer_module, []))
+            pool_unassigned = list(module_groups.get(0, []))
+            search_pools.append(pool_pref + pool_unassigned)
+        # fallback pool (any module) only when module distribution is not enforced or ignoring module allocation
+        try:
+            module_active = bool(module_percents)
+        except Exception:
+            module_active = False
+        if ignore_module_allocation or not module_active or not prefer_module:
+            search_pools.append(all_q)
+        for pool in search_pools:
+            for q in pool:
+                # Always avoid repeating the same question within this paper
+                if q.id in chosen_ids:
+                    continue
+                # If not allowing reuse, also avoid items blocked by recent drafts
+                if not allow_reuse and q.id in blocked_ids:
+                    continue
+                if target_marks is not None and q.marks == target_marks and (norm_text(q.text) not in chosen_texts) and (allow_reuse or norm_text(q.text) not in blocked_texts):
+                    # If RBT distribution is active, ensure either preferred RBT matches or at least the level has remaining capacity
+                    if prefer_rbt is not None:
+                        if q.rbt_level == prefer_rbt:
+                            return q
+                    else:
+                        # No specific preference; enforce availability if configured
+                        try:
+                            rbt_active = any(rbt_percents.values())
+                        except Exception:
+                            rbt_active = False
+                        if ignore_rbt_allocation or (not rbt_active or rbt_allowed(q.rbt_level)):
+                            return q
+        # 2) any not used with preferred rbt/co
+        for pool in search_pools:
+            for q in pool:
+                if q.id in chosen_ids:
+                    continue
+                if not allow_reuse and q.id in blocked_ids:
+                    continue
+                if prefer_rbt and q.rbt_level == prefer_rbt and (norm_text(q.text) not in chosen_texts) and (allow_reuse or norm_text(q.text) not in blocked_texts):
+                    # also ensure availability if RBT plan active
+                    try:
+                        if ignore_rbt_allocation or not any(rbt_percents.values()) or rbt_allowed(q.rbt_level):
+                            return q
+                    except Exception:
+                        return q
+                if prefer_co and prefer_co in (q.co_tags or []) and (norm_text(q.text) not in chosen_texts) and (allow_reuse or norm_text(q.text) not in blocked_texts):
+                    # if RBT plan is active, still ensure availability for the question's level
+                    try:
+                        if ignore_rbt_allocation or not any(rbt_percents.values()) or rbt_allowed(q.rbt_level):
+                            return q
+                    except Exception:
+                        return q
+        # 3) any not used
+        for pool in search_pools:
+            for q in pool:
+                # final fallback respects non-repetition within this paper
+                if q.id in chosen_ids:
+                    continue
+                if not allow_reuse and q.id in blocked_ids:
+                    continue
+                if norm_text(q.text) in chosen_texts:
+                    continue
+                if not allow_reuse and norm_text(q.text) in blocked_texts:
+                    continue
+                    # final fallback respects RBT availability if configured
+                    try:
+                        if ignore_rbt_allocation or not any(rbt_percents.values()) or rbt_allowed(q.rbt_level):
+                            return q
+                    except Exception:
+                        return q
+        return None
+
+    # Prepare module distribution plan based on percentages (over total parts)
+    module_percents = config.get('module_percentages') or {}
+    # Normalize keys to int
+    module_percents = {int(k): int(module_percents[k]) for k in module_percents.keys() if str(k).isdigit()}
+    total_parts = 0
+    for qcfg in config.get('questions', []):
+        total_parts += len(qcfg.get('parts', ['a','b']))
+    # Build target counts per module
+    remaining_counts = {}
+    if total_parts > 0 and module_percents:
+        assigned = 0
+        remainders = []
+        for m, pct in module_percents.items():
+            exact = pct * total_parts / 100.0
+            cnt = int(exact)
+            remaining_counts[m] = cnt
+            assigned += cnt
+            remainders.append((m, exact - cnt))
+        # Distribute leftover by highest remainders
+        leftover = max(0, total_parts - assigned)
+        remainders.sort(key=lambda x: x[1], reverse=True)
+        i = 0
+        while leftover > 0 and i < len(remainders):
+            m = remainders[i][0]
+            remaining_counts[m] = remaining_counts.get(m, 0) + 1
+            leftover -= 1
+            i = (i + 1) % max(1, len(remainders))
+    # Helper to check if a module is currently allowed (percent > 0)
+    def module_allowed(mod):
+        if not module_percents:
+            return True
+        # If plan exists, only allow modules with remaining > 0
+        return remaining_counts.get(mod, 0) > 0
+    # Flatten plan to cycle
+    module_plan = []
+    for m, cnt in remaining_counts.items():
+        module_plan.extend([m] * cnt)
+    plan_idx = 0
+
+    # Prepare RBT distribution plan based on percentages (L1-L6 over total parts)
+    rbt_enabled = bool(config.get('rbt_enabled', True))
+    rbt_percents = (config.get('rbt_percentages') or {}) if rbt_enabled else {}
+    # Normalize keys to canonical L1-L6 strings
+    rbt_keys = ['L1','L2','L3','L4','L5','L6']
+    rbt_percents = {k: int(rbt_percents.get(k, 0)) for k in rbt_keys}
+    remaining_rbt = {}
+    if rbt_enabled and total_parts > 0 and any(rbt_percents.values()):
+        assigned = 0
+        remainders = []
+        for lvl, pct in rbt_percents.items():
+            exact = pct * total_parts / 100.0
+            cnt = int(exact)
+            remaining_rbt[lvl] = cnt
+            assigned += cnt
+            remainders.append((lvl, exact - cnt))
+        leftover = max(0, total_parts - assigned)
+        remainders.sort(key=lambda x: x[1], reverse=True)
+        i = 0
+        while leftover > 0 and i < len(remainders):
+            lvl = remainders[i][0]
+            remaining_rbt[lvl] = remaining_rbt.get(lvl, 0) + 1
+            leftover -= 1
+            i = (i + 1) % max(1, len(remainders))
+    def rbt_allowed(lvl):
+        if not rbt_enabled or not any(rbt_percents.values()):
+            return True
+        return remaining_rbt.get(lvl, 0) > 0
+    rbt_plan = []
+    for lvl, cnt in remaining_rbt.items():
+        rbt_plan.extend([lvl] * cnt)
+    rbt_idx = 0
+
+    for qcfg in config.get('questions', []):
+        qno = qcfg.get('qno')
+        parts = qcfg.get('parts', ['a','b'])
+        marks_map = qcfg.get('marks', {})
+        row = {"type":"question", "qno": qno, "parts": []}
+        # Try to fill from questions with subparts first
+        # If a question has enough subparts, map them to parts
+        chosen = None
+        # Pass 1: prefer subparts question that hasn't been chosen in this draft and not recently used
+        for q in all_q:
+            # never reuse the same question within the same generated paper
+            if q.id in chosen_ids:
+                continue
+            # avoid same normalized text selected already
+            if norm_text(q.text) in chosen_texts:
+                continue
+            # avoid recently used pool on first pass
+            if (q.id in blocked_ids or norm_text(q.text) in blocked_texts):
+                continue
+            if q.subparts and len(q.subparts) >= len(parts):
+                # Enforce module percentages: require remaining capacity for this module to cover all parts
+                qm = q.module or 0
+                qlvl = q.rbt_level
+                rbt_ok = (not rbt_enabled or not any(rbt_percents.values())) or (qlvl in remaining_rbt and remaining_rbt.get(qlvl, 0) >= len(parts))
+                if (not module_percents or remaining_counts.get(qm, 0) >= len(parts)) and rbt_ok:
+                    chosen = q
+                    break
+        # Pass 2: allow recently used if nothing found yet
+        if chosen is None:
+            for q in all_q:
+                if q.id in chosen_ids:
+                    continue
+                if norm_text(q.text) in chosen_texts:
+                    continue
+                if q.subparts and len(q.subparts) >= len(parts):
+                    qm = q.module or 0
+                    qlvl = q.rbt_level
+                    rbt_ok = (not rbt_enabled or not any(rbt_percents.values())) or (qlvl in remaining_rbt and remaining_rbt.get(qlvl, 0) >= len(parts))
+                    if (not module_percents or remaining_counts.get(qm, 0) >= len(parts)) and rbt_ok:
+                        chosen = q
+                        break
+        if chosen is not None:
+            chosen_ids.add(chosen.id)
+            chosen_texts.add(norm_text(chosen.text))
+            for idx, p in enumerate(parts):
+                sp = chosen.subparts[idx]
+                row["parts"].append({
+                    "label": p,
+                    "text": clean_question_text(sp.get('text') if isinstance(sp, dict) else str(sp)),
+                    "marks": marks_map.get(p),
+                    "co": chosen.co_tags or [],
+                    "rbt": chosen.rbt_level,
+                    "source_qid": chosen.id,
+                })
+            # Decrement remaining count for module and RBT for each part consumed
+            if module_percents:
+                qm = chosen.module
+                qm_eff = None
+                if qm in remaining_counts:
+                    qm_eff = qm
+                else:
+                    # allocate to any module with enough remaining, else any with >0
+                    qm_eff = next((m for m,cnt in remaining_counts.items() if cnt >= len(parts)), None)
+                    if qm_eff is None:
+                        qm_eff = next((m for m,cnt in remaining_counts.items() if cnt > 0), None)
+                if qm_eff is not None:
+                    remaining_counts[qm_eff] = max(0, remaining_counts[qm_eff] - len(parts))
+            if any(rbt_percents.values()):
+                qlvl = chosen.rbt_level
+                if qlvl in remaining_rbt:
+                    remaining_rbt[qlvl] = max(0, remaining_rbt[qlvl] - len(parts))
+            rows.append(row)
+            continue
+        # Otherwise pick per-part
+        for p in parts:
+            target_mk = marks_map.get(p)
+            # Choose preferred module per plan when available
+            prefer_module = None
+            if plan_idx < len(module_plan):
+                prefer_module = module_plan[plan_idx]
+            # Choose preferred RBT per plan when available
+            prefer_rbt = None
+            if rbt_idx < len(rbt_plan):
+                prefer_rbt = rbt_plan[rbt_idx]
+            q = None
+            # First, enforce module plan strictly if available
+            if module_percents:
+                # If we have a preferred module with remaining count, search only within that module
+                if prefer_module is not None and module_allowed(prefer_module):
+                    # Try with RBT preference too if applicable
+                    if prefer_rbt is not None and rbt_allowed(prefer_rbt):
+                        q = pick_question(target_mk, prefer_module=prefer_module, prefer_rbt=prefer_rbt)
+                    if q is None:
+                        q = pick_question(target_mk, prefer_module=prefer_module)
+                # If not found, try any module that still has remaining count
+                if q is None:
+                    for mod in [m for m,cnt in remaining_counts.items() if cnt > 0]:
+                        if prefer_rbt is not None and rbt_allowed(prefer_rbt):
+                            q = pick_question(target_mk, prefer_module=mod, prefer_rbt=prefer_rbt)
+                        if q is None:
+                            q = pick_question(target_mk, prefer_module=mod)
+                        if q is not None:
+                            prefer_module = mod
+                            break
+            # If no module percentages provided, allow any module as fallback
+            # If percentages are configured, DO NOT pick from modules with zero remaining
+            if q is None and not module_percents:
+                if prefer_rbt is not None and rbt_allowed(prefer_rbt):
+                    q = pick_question(target_mk, prefer_rbt=prefer_rbt)
+                if q is None:
+                    q = pick_question(target_mk)
+
+            # Progressive relaxation always: try to avoid blanks
+            if q is None:
+                # 1) keep module preference, ignore RBT allocation
+                if prefer_module is not None and module_allowed(prefer_module):
+                    if prefer_rbt is not None:
+                        q = pick_question(target_mk, prefer_module=prefer_module, prefer_rbt=prefer_rbt, ignore_rbt_allocation=True)
+                    if q is None:
+                        q = pick_question(target_mk, prefer_module=prefer_module, ignore_rbt_allocation=True)
+                # 2) keep RBT preference, ignore module allocation
+                if q is None and prefer_rbt is not None:
+                    q = pick_question(target_mk, prefer_rbt=prefer_rbt, ignore_module_allocation=True)
+                # 3) ignore both allocations
+                if q is None:
+                    q = pick_question(target_mk, ignore_rbt_allocation=True, ignore_module_allocation=True)
+                # 4) as a last resort, allow reuse
+                if q is None:
+                    if prefer_module is not None and module_allowed(prefer_module):
+                        q = pick_question(target_mk, prefer_module=prefer_module, allow_reuse=True, ignore_rbt_allocation=True)
+                    if q is None and prefer_rbt is not None:
+                        q = pick_question(target_mk, prefer_rbt=prefer_rbt, allow_reuse=True, ignore_module_allocation=True)
+                    if q is None:
+                        q = pick_question(target_mk, allow_reuse=True, ignore_rbt_allocation=True, ignore_module_allocation=True)
+                # 5) final fill: ignore marks constraint entirely to avoid blanks
+                if q is None:
+                    # try with current preferences but no marks requirement
+                    if prefer_module is not None and module_allowed(prefer_module):
+                        if prefer_rbt is not None:
+                            q = pick_question(None, prefer_module=prefer_module, prefer_rbt=prefer_rbt, allow_reuse=True, ignore_rbt_allocation=True)
+                        if q is None:
+                            q = pick_question(None, prefer_module=prefer_module, allow_reuse=True, ignore_rbt_allocation=True)
+                    if q is None and prefer_rbt is not None:
+                        q = pick_question(None, prefer_rbt=prefer_rbt, allow_reuse=True, ignore_module_allocation=True)
+                    if q is None:
+                        q = pick_question(None, allow_reuse=True, ignore_rbt_allocation=True, ignore_module_allocation=True)
+            if q is not None:
+                chosen_ids.add(q.id)
+                # decrement remaining for module if applicable
+                # Decrement effective module: question module if valid, else current preferred, else any with >0
+                qm = q.module
+                qm_eff = None
+                if module_percents:
+                    if qm in remaining_counts and remaining_counts[qm] > 0:
+                        qm_eff = qm
+                    elif 'prefer_module' in locals() and prefer_module in remaining_counts and remaining_counts[prefer_module] > 0:
+                        qm_eff = prefer_module
+                    else:
+                        qm_eff = next((m for m,cnt in remaining_counts.items() if cnt > 0), None)
+                    if qm_eff is not None:
+                        remaining_counts[qm_eff] -= 1
+                # decrement remaining for RBT if applicable
+                if any(rbt_percents.values()):
+                    qlvl = q.rbt_level or prefer_rbt
+                    if qlvl in remaining_rbt and remaining_rbt[qlvl] > 0:
+                        remaining_rbt[qlvl] -= 1
+                plan_idx += 1
+                rbt_idx += 1
+                chosen_texts.add(norm_text(q.text))
+                row["parts"].append({
+                    "label": p,
+                    "text": clean_question_text(q.text),
+                    "marks": target_mk,
+                    "co": q.co_tags or [],
+                    "rbt": q.rbt_level,
+                    "source_qid": q.id,
+                })
+            else:
+                row["parts"].append({"label": p, "text": "", "marks": target_mk, "co": [], "rbt": None})
+        rows.append(row)
+    return rows
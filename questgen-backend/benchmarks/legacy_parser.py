@@ -0,0 +1,105 @@
+"""
+Frozen copy of the original parse_bank_text / clean_question_text.
+Used as the reference implementation when checking the compiled parser
+in app.py against the regression corpus (see bench_parser.py).
+Do not "fix" anything in here.
+"""
+import re
+
+
+def parse_bank_text(text, module=None):
+    # Normalize
+    lines = text.replace('\r\n', '\n').replace('\r', '\n')
+    # Split questions by Q<number>.
+    # Instead of split, we'll iterate line by line to avoid regex pitfalls
+    blocks = []
+    current = []
+    for line in lines.split('\n'):
+        if re.match(r"(?i)^Q\s*\d+\.", line.strip()):
+            if current:
+                blocks.append('\n'.join(current).strip())
+                current = []
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current).strip())
+
+    parsed = []
+    for b in blocks:
+        # Check for module in the format [Module X] or [M X] where X is 1-5
+        mod = module
+        mod_match = re.search(r'\[\s*(?:Module|M)\s*(\d+)\]', b, re.IGNORECASE)
+        if mod_match:
+            mod = int(mod_match.group(1))
+            if mod < 1 or mod > 5:
+                mod = module  # Fall back to provided module if invalid
+        
+        # Marks [8M]
+        # Marks like [10] or [10M]
+        m = re.search(r"\[(\d+)(?:\s*[mM])?\]", b)
+        marks = int(m.group(1)) if m else None
+        # CO tags [CO4]
+        cos = re.findall(r"\[CO(\d+)\]", b)
+        co_tags = [f"CO{c}" for c in cos] if cos else []
+        # RBT [L2]
+        rbt = None
+        r = re.search(r"\[L([1-6])\]", b)
+        if r:
+            rbt = f"L{r.group(1)}"
+        # Subparts (lettered like a) or roman like i))
+        subparts = []
+        # 1) Line-start variants
+        pat_letter = re.compile(r"(?mi)^\s*\(?([a-d])\)\s+(.*)$")
+        pat_roman  = re.compile(r"(?mi)^\s*\(?((?:i{1,3}|iv|v|vi{0,3}|x))\)\s+(.*)$")
+        for m1 in pat_letter.finditer(b):
+            subparts.append({"label": m1.group(1), "text": m1.group(2).strip()})
+        for m2 in pat_roman.finditer(b):
+            subparts.append({"label": m2.group(1), "text": m2.group(2).strip()})
+        # 2) Inline variants within the same line (e.g., "... i) text ... ii) text ...")
+        if not subparts:
+            inline = b.replace('\n', ' ')
+            # Build a list of (label, start_index) for roman numerals inline
+            matches = list(re.finditer(r"(?i)\b\(?((?:i{1,3}|iv|v|vi{0,3}|x))\)\s+", inline))
+            if matches:
+                for idx, m in enumerate(matches):
+                    label = m.group(1)
+                    start = m.end()
+                    end = matches[idx+1].start() if idx+1 < len(matches) else len(inline)
+                    subparts.append({"label": label, "text": inline[start:end].strip()})
+            else:
+                # Try lettered inline a) b)
+                matches = list(re.finditer(r"(?i)\b\(?([a-d])\)\s+", inline))
+                if matches:
+                    for idx, m in enumerate(matches):
+                        label = m.group(1)
+                        start = m.end()
+                        end = matches[idx+1].start() if idx+1 < len(matches) else len(inline)
+                        subparts.append({"label": label, "text": inline[start:end].strip()})
+        # Remove leading Qn. prefix from text
+        main_text = re.sub(r"(?i)^Q\s*\d+\.?\s*", "", b.strip())
+        # Remove module tag from text if it exists
+        if mod_match:
+            main_text = main_text.replace(mod_match.group(0), '').strip()
+        
+        parsed.append({
+            "text": main_text,
+            "marks": marks,
+            "co_tags": co_tags,
+            "rbt_level": rbt,
+            "subparts": subparts or None,
+            "q_type": "DESCRIPTIVE",
+            "module": mod
+        })
+    return parsed
+
+def clean_question_text(s: str) -> str:
+    if not s:
+        return s
+    # Remove marks like [10] or [10M]
+    s = re.sub(r"\[(\d+)(?:\s*[mM])?\]", "", s)
+    # Remove CO tags like [CO4]
+    s = re.sub(r"\[CO\d+\]", "", s)
+    # Remove RBT tags like [L2]
+    s = re.sub(r"\[L[1-6]\]", "", s)
+    # Collapse extra spaces
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
@@ -0,0 +1,121 @@
+"""
+Synthetic question bank generator used by the benchmark scripts.
+Produces bank text in the same shape as the uploaded module PDFs
+(Q<n>. headers, [10M] marks, [CO3] and [L2] tags, subparts) and can
+write it out as a plain-text PDF that pdfplumber can read back.
+
+    python benchmarks/synthetic_bank.py --questions 500 --out /tmp/bank
+    (writes /tmp/bank.txt and /tmp/bank.pdf)
+"""
+import argparse
+import random
+
+TOPICS = [
+    "machine learning", "normalization", "big data analytics", "decision trees",
+    "regression analysis", "neural networks", "data visualization", "clustering",
+    "feature engineering", "model evaluation", "blockchain consensus", "water quality",
+]
+VERBS = ["Explain", "Discuss", "Describe", "Compare", "Illustrate", "Analyse", "Apply"]
+
+
+def make_bank_text(n_questions=100, seed=0):
+    """Return bank text with `n_questions` questions.
+
+    Covers the shapes parse_bank_text handles: Q<n>. headers, [8] and [10M] marks,
+    [CO3] and [L2] tags, [Module 4] tags, and lettered, roman and inline subparts.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(1, n_questions + 1):
+        marks = rng.choice([5, 6, 7, 8, 10])
+        marks_tag = f"[{marks}M]" if rng.random() < 0.5 else f"[{marks}]"
+        tags = f"[CO{rng.randint(1, 5)}][L{rng.randint(1, 4)}]"
+        if rng.random() < 0.2:
+            tags += f" [Module {rng.randint(1, 5)}]"
+        topic = rng.choice(TOPICS)
+        shape = i % 10
+        if shape == 3:
+            # Lettered subparts on their own lines
+            lines.append(f"Q{i}. {marks_tag} Answer the following on {topic} {tags}")
+            for label in ["a", "b"]:
+                lines.append(f"{label}) {rng.choice(VERBS)} {rng.choice(TOPICS)}")
+        elif shape == 6:
+            # Roman subparts on their own lines
+            lines.append(f"Q{i}. {marks_tag} {rng.choice(VERBS)} the following:")
+            for label in ["i", "ii", "iii"]:
+                lines.append(f"{label}) {rng.choice(TOPICS)}")
+            lines[-1] += f" {tags}"
+        elif shape == 9:
+            # Inline roman subparts
+            parts = " ".join(f"{label}) {rng.choice(TOPICS)}" for label in ["i", "ii"])
+            lines.append(f"Q{i}. {marks_tag} Compare {parts} {tags}")
+        else:
+            line = f"Q{i}. {marks_tag} {rng.choice(VERBS)} {topic} with a suitable example"
+            if rng.random() < 0.3:
+                # Long questions wrap onto a second line, tags at the end
+                lines.append(line)
+                lines.append(f"and discuss its limitations {tags}")
+            else:
+                lines.append(f"{line} {tags}")
+    return "\n".join(lines)
+
+
+def _pdf_escape(s):
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(text, path, lines_per_page=45):
+    """Write `text` to a minimal single-font PDF, `lines_per_page` lines per page."""
+    lines = text.split("\n")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = []  # object bodies, object number = index + 1
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # pages tree, filled in once page objects are known
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for page_lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        for ln in page_lines:
+            ops.append(f"({_pdf_escape(ln)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream.encode('latin-1', 'replace'))} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj\n{body}\nendobj\n".encode("latin-1", "replace")
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    with open(path, "wb") as fh:
+        fh.write(out)
+    return len(pages)
+
+
+def write_bank(prefix, n_questions=100, seed=0, lines_per_page=45):
+    """Write <prefix>.txt and <prefix>.pdf; returns (text, page_count)."""
+    text = make_bank_text(n_questions, seed)
+    with open(prefix + ".txt", "w", encoding="utf-8") as fh:
+        fh.write(text)
+    pages = write_pdf(text, prefix + ".pdf", lines_per_page)
+    return text, pages
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", required=True, help="output path prefix")
+    args = ap.parse_args()
+    _, pages = write_bank(args.out, args.questions, args.seed)
+    print(f"wrote {args.out}.txt and {args.out}.pdf ({args.questions} questions, {pages} pages)")
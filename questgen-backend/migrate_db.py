@@ -1,74 +1,127 @@
 """
-Database migration script to add module support and question_banks table
-Run this script to update your existing database schema
+Database migration script.
+
+Applies pending schema migrations (MIGRATIONS in app.py, recorded in the
+schema_migrations table) and checks that the list endpoints' queries use indexes.
+
+    python migrate_db.py                   # migrate to the latest version
+    python migrate_db.py --target 1        # migrate up to version 1 only
+    python migrate_db.py --status          # current version and pending migrations
+    python migrate_db.py --check-indexes   # EXPLAIN every list endpoint query (SQLite)
 """
-import sqlite3
+import argparse
 import os
+import sys
+
+# Migrate explicitly below, never on import
+os.environ["AUTO_MIGRATE"] = "0"
+
+from sqlalchemy import event  # noqa: E402
+
+from app import (  # noqa: E402
+    app, db, MIGRATIONS, User, UserRole, run_migrations, schema_version, _query_question_pool,
+)
+
+# Tables that grow with use; a full scan of any of them in a list query is reported
+INDEXED_TABLES = {
+    'questions', 'question_co_tags', 'question_banks', 'question_usage', 'subject_syllabus',
+    'module_notes', 'schedule_events', 'student_tasks', 'paper_drafts', 'ingest_jobs',
+}
+
+# Listings paged by key (or streamed); these must read rows in key order, so a sort is reported
+KEY_ORDERED = {
+    'GET /api/questions', 'GET /api/questions filtered', 'GET /api/questions by CO', 'GET /api/questions ndjson',
+}
+
+
+def list_endpoint_calls(client):
+    """(label, callable) for each list query, with ids taken from the database where needed."""
+    calls = [
+        ("GET /api/questions", lambda: client.get('/api/questions?scheme_id=1&subject_id=1&limit=50')),
+        ("GET /api/questions filtered", lambda: client.get(
+            '/api/questions?scheme_id=1&subject_id=1&module=1&status=APPROVED&rbt=L2&limit=50')),
+        ("GET /api/questions by CO", lambda: client.get('/api/questions?scheme_id=1&subject_id=1&co=CO1&limit=50')),
+        ("GET /api/questions ndjson", lambda: client.get('/api/questions?scheme_id=1&subject_id=1&format=ndjson').get_data()),
+        ("GET /api/questions/search", lambda: client.get('/api/questions/search?q=explain&scheme_id=1&subject_id=1')),
+        ("GET /api/question-banks", lambda: client.get('/api/question-banks?scheme_id=1&subject_id=1')),
+        ("GET /api/subject-syllabus", lambda: client.get('/api/subject-syllabus?scheme_id=1&subject_id=1')),
+        ("GET /api/module-notes", lambda: client.get('/api/module-notes?scheme_id=1&subject_id=1')),
+        ("generation pool", lambda: _query_question_pool(1, 1)),
+    ]
+    teacher = User.query.filter_by(role=UserRole.TEACHER).first()
+    student = User.query.filter_by(role=UserRole.STUDENT).first()
+    if teacher is not None:
+        calls.append(("GET /api/schedule/teacher", lambda: client.get(f'/api/schedule/teacher/{teacher.id}')))
+    if student is not None:
+        calls.append(("GET /api/schedule/student", lambda: client.get(f'/api/schedule/student/{student.id}')))
+        calls.append(("GET /api/student-tasks", lambda: client.get(f'/api/student-tasks?student_id={student.id}')))
+    if teacher is None or student is None:
+        print("note: no teacher/student users yet, schedule and task endpoints were not checked")
+    return calls
+
+
+def check_indexes():
+    """EXPLAIN QUERY PLAN every SELECT the list endpoints issue.
+
+    Returns the number of queries that fully scan a table, or that sort a listing paged by key.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        print("index check only supports SQLite")
+        return 0
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    client = app.test_client()
+    failures = 0
+    for label, call in list_endpoint_calls(client):
+        captured.clear()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            call()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        statements = list(captured)
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+                scans = [step for step in plan
+                         if step.startswith('SCAN ') and step.split()[1] in INDEXED_TABLES and 'INDEX' not in step]
+                sorts = label in KEY_ORDERED and any(step.startswith('USE TEMP B-TREE FOR ORDER BY') for step in plan)
+                status = "SCAN" if scans else "SORT" if sorts else "ok"
+                failures += bool(scans or sorts)
+                print(f"{status:<4} {label}: {'; '.join(plan)}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", type=int, help="stop after this version")
+    ap.add_argument("--status", action="store_true", help="show the schema version and pending migrations")
+    ap.add_argument("--check-indexes", action="store_true", help="EXPLAIN the list endpoint queries")
+    args = ap.parse_args()
+
+    with app.app_context():
+        if args.status:
+            current = schema_version()
+            print(f"schema version {current} (latest {MIGRATIONS[-1][0]})")
+            for version, name, _ in MIGRATIONS:
+                if version > current:
+                    print(f"  pending {version}: {name}")
+            return 0
+        if args.check_indexes:
+            failures = check_indexes()
+            print(f"{failures} quer{'y' if failures == 1 else 'ies'} scanning a table or sorting a keyset page")
+            return 1 if failures else 0
+        applied = run_migrations(args.target)
+        for version, name, _ in MIGRATIONS:
+            if version in applied:
+                print(f"applied {version}: {name}")
+        print(f"schema version {schema_version()}")
+    return 0
 
-def migrate_database():
-    # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'instance', 'app.db')
-    if not os.path.exists(db_path):
-        db_path = os.path.join(os.path.dirname(__file__), 'app.db')
-    
-    if not os.path.exists(db_path):
-        print("Database file not found!")
-        return False
-    
-    print(f"Connecting to database: {db_path}")
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    try:
-        # Check if module column exists in questions table
-        cursor.execute("PRAGMA table_info(questions);")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'module' not in columns:
-            print("Adding 'module' column to questions table...")
-            cursor.execute("ALTER TABLE questions ADD COLUMN module INTEGER")
-            print("✓ Module column added successfully")
-        else:
-            print("✓ Module column already exists")
-        
-        # Check if question_banks table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='question_banks';")
-        if not cursor.fetchone():
-            print("Creating 'question_banks' table...")
-            cursor.execute('''
-                CREATE TABLE question_banks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    scheme_id INTEGER NOT NULL,
-                    subject_id INTEGER NOT NULL,
-                    module INTEGER NOT NULL,
-                    file_name VARCHAR(255) NOT NULL,
-                    file_path VARCHAR(512) NOT NULL,
-                    question_count INTEGER DEFAULT 0,
-                    uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (scheme_id) REFERENCES schemes (id),
-                    FOREIGN KEY (subject_id) REFERENCES subjects (id)
-                )
-            ''')
-            print("✓ Question banks table created successfully")
-        else:
-            print("✓ Question banks table already exists")
-        
-        # Commit the changes
-        conn.commit()
-        print("\n✓ Database migration completed successfully!")
-        return True
-        
-    except Exception as e:
-        print(f"\n✗ Error during migration: {e}")
-        conn.rollback()
-        return False
-        
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
-    print("=" * 60)
-    print("Database Migration Script")
-    print("=" * 60)
-    migrate_database()
-    print("=" * 60)
+    sys.exit(main())